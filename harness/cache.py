@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any
+
+CACHE_MODES = ("off", "read", "write", "readwrite")
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def cache_key(**parts: Any) -> str:
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return text_hash(blob)
+
+
+class DiskCache:
+    """Content-addressed JSON store with size-bounded LRU eviction.
+
+    Entries live in ``root/<key[:2]>/<key>.json``. Reads bump the file mtime,
+    so eviction drops the least recently used entries first.
+    """
+
+    def __init__(self, root: Path, max_bytes: int | None = None) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        self._lock = threading.Lock()
+        self._size: int | None = None
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.json"
+
+    def _entries(self) -> list[Path]:
+        if not self.root.exists():
+            return []
+        return list(self.root.glob("*/*.json"))
+
+    def get(self, key: str) -> Any | None:
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data.get("value")
+
+    def put(self, key: str, value: Any) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        blob = json.dumps({"key": key, "value": value}).encode("utf-8")
+        try:
+            previous = path.stat().st_size
+        except OSError:
+            previous = 0
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_name, path)
+        if self.max_bytes is None:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = sum(p.stat().st_size for p in self._entries())
+            else:
+                self._size += len(blob) - previous
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        assert self.max_bytes is not None
+        target = int(self.max_bytes * 0.9)
+        stats = []
+        for p in self._entries():
+            try:
+                stats.append((p.stat(), p))
+            except OSError:
+                continue
+        stats.sort(key=lambda item: item[0].st_mtime)
+        size = sum(st.st_size for st, _ in stats)
+        for st, p in stats:
+            if size <= target:
+                break
+            try:
+                p.unlink()
+            except OSError:
+                continue
+            size -= st.st_size
+        self._size = size
+
+
+class ResponseCache(DiskCache):
+    """Model generations keyed by model, prompt hash, sampling params and attempt."""
+
+    def key(
+        self,
+        model: str,
+        prompt: str,
+        params: dict[str, Any],
+        attempt: int,
+    ) -> str:
+        return cache_key(
+            model=model,
+            prompt=text_hash(prompt),
+            params=params,
+            attempt=attempt,
+        )
+
+
+class VerdictCache(DiskCache):
+    """Arbiter verdicts keyed by arbiter identity, task text hash and answer hash."""
+
+    def key(
+        self, arbiter: Any, prompt_template: str, task_text: str, answer: str
+    ) -> str:
+        return cache_key(
+            arbiter=arbiter,
+            template=text_hash(prompt_template),
+            task=text_hash(task_text),
+            answer=text_hash(answer),
+        )
+
+
+class CapabilityCache(DiskCache):
+    """What an OpenAI-compatible endpoint accepts, per (api_base, model).
+
+    Values hold the ``endpoint`` that answered, effort downgrades the server
+    forced (``efforts``, e.g. ``{"xhigh": "high"}``) and whether chat accepts
+    a ``reasoning`` parameter, so later calls skip the failed fallbacks.
+    """
+
+    def key(self, api_base: str, model: str) -> str:
+        return cache_key(api_base=api_base.rstrip("/"), model=model)
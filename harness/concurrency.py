@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+
+class TokenBucket:
+    """Allows ``rate`` acquisitions per second on average, in bursts of ``burst``."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.rate = rate
+        self.burst = max(1.0, burst if burst is not None else rate)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = self._clock()
+                elapsed = now - self._updated
+                self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class ModelLimiter:
+    """Caps in-flight generations and, optionally, request rate per model name.
+
+    ``rpm`` gives every model a token bucket shared by all workers, so a run
+    can sit at a provider's sustained limit instead of tripping it.
+    """
+
+    def __init__(self, per_model: int | None = None, rpm: float | None = None) -> None:
+        self.per_model = per_model if per_model and per_model > 0 else None
+        self.rpm = rpm if rpm and rpm > 0 else None
+        self._lock = threading.Lock()
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def _bucket(self, model: str) -> TokenBucket | None:
+        if self.rpm is None:
+            return None
+        with self._lock:
+            bucket = self._buckets.get(model)
+            if bucket is None:
+                # A burst of one: requests are spread evenly over the minute.
+                bucket = TokenBucket(self.rpm / 60.0, burst=1)
+                self._buckets[model] = bucket
+            return bucket
+
+    def _semaphore(self, model: str) -> threading.BoundedSemaphore | None:
+        if self.per_model is None:
+            return None
+        with self._lock:
+            sem = self._semaphores.get(model)
+            if sem is None:
+                sem = threading.BoundedSemaphore(self.per_model)
+                self._semaphores[model] = sem
+            return sem
+
+    def acquire(self, model: str) -> None:
+        """Charge one request to ``model``'s rate limit, waiting for a token."""
+        bucket = self._bucket(model)
+        if bucket is not None:
+            bucket.acquire()
+
+    @contextmanager
+    def slot(self, model: str, charge: bool = True) -> Iterator[None]:
+        """Hold a concurrency slot; ``charge`` also takes one request's token."""
+        sem = self._semaphore(model)
+        bucket = self._bucket(model) if charge else None
+        if sem is None:
+            if bucket is not None:
+                bucket.acquire()
+            yield
+            return
+        with sem:
+            if bucket is not None:
+                bucket.acquire()
+            yield
+
+
+class LimitedClient:
+    """Wraps a model client so every generate call holds a per-model slot.
+
+    An in-process adapter with a ``before_request`` hook is charged the rate
+    limit on each HTTP request it sends, retries and endpoint fallbacks
+    included; other clients are charged once per generate call. A client with
+    a ``limiter`` field (:class:`~harness.models.ModelClient`) takes the slot
+    itself after a response cache miss, so cached replays are not throttled.
+    """
+
+    def __init__(self, client: Any, limiter: ModelLimiter) -> None:
+        self.client = client
+        self.limiter = limiter
+        adapter = getattr(client, "adapter", None)
+        self.per_request = hasattr(adapter, "before_request")
+        if self.per_request:
+            adapter.before_request = limiter.acquire
+        self.delegated = hasattr(client, "limiter")
+        if self.delegated:
+            client.limiter = limiter
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        task_type: str,
+        task_id: str,
+        attempt: int = 1,
+        on_token: Callable[[str], None] | None = None,
+        on_meta: Callable[[dict[str, Any]], None] | None = None,
+    ) -> str:
+        callbacks = {"on_token": on_token, "on_meta": on_meta}
+        kwargs = {k: v for k, v in callbacks.items() if v is not None}
+        if self.delegated:
+            return self.client.generate(
+                prompt, model, task_type, task_id, attempt=attempt, **kwargs
+            )
+        with self.limiter.slot(model, charge=not self.per_request):
+            return self.client.generate(
+                prompt, model, task_type, task_id, attempt=attempt, **kwargs
+            )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
@@ -1,11 +1,17 @@
 from __future__ import annotations
 
 import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 from harness.graders import grade_lean, grade_md, grade_py, grade_synth
+from harness.graders.arbiter import resolve_verdict
+from harness.models import StreamAborted
+from harness.stats import should_stop_sampling
 
 
 @dataclass
@@ -63,6 +69,156 @@ def build_prompt(task: Task) -> str:
     )
 
 
+def grade_output(
+    task: Task,
+    output: str,
+    repo_root: Path,
+    min_coverage: float,
+    arbiter: Any | None,
+    py_grader: Any | None = None,
+) -> dict[str, Any]:
+    if task.task_type == "py":
+        evaluate = grade_py.evaluate if py_grader is None else py_grader.evaluate
+        return evaluate(
+            task.path,
+            output,
+            repo_root=repo_root,
+            min_coverage=min_coverage,
+        )
+    if task.task_type == "md":
+        return grade_md.evaluate(task.path, output, arbiter=arbiter)
+    if task.task_type == "lean":
+        return grade_lean.evaluate(task.path, output, arbiter=arbiter)
+    return grade_synth.evaluate(task.path, output, arbiter=arbiter)
+
+
+# Checks on streamed text for constraints that, once broken, fail the answer
+# whatever follows; used to cancel runaway generations early. Each attempt
+# gets a fresh check, which is fed the deltas and keeps its own running state.
+STREAM_CHECKS: dict[str, Callable[[], Callable[[str], str | None]]] = {
+    "synth": grade_synth.StreamCheck,
+    "lean": grade_lean.StreamCheck,
+}
+
+
+class TokenTimer:
+    """``on_token`` callback that records when streamed text arrives.
+
+    With a ``check`` every token is passed to it as it arrives, and a
+    returned reason aborts the generation with :class:`StreamAborted`.
+    """
+
+    def __init__(self, check: Callable[[str], str | None] | None = None) -> None:
+        self.start = time.time()
+        self.first: float | None = None
+        self.last: float | None = None
+        self.tokens = 0
+        self.check = check
+        self.parts: list[str] = []
+
+    def __call__(self, text: str) -> None:
+        now = time.time()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.tokens += 1
+        if self.check is not None:
+            self.parts.append(text)
+            reason = self.check(text)
+            if reason is not None:
+                raise StreamAborted(reason, "".join(self.parts))
+
+    def metrics(self) -> dict[str, Any]:
+        """Time to first token and decode rate (tokens after the first per second).
+
+        A token is one streamed delta, usually one model token; sources that
+        cannot stream deliver everything as one token and have no rate.
+        """
+        ttft = None if self.first is None else self.first - self.start
+        rate = None
+        if self.first is not None and self.last is not None and self.tokens > 1:
+            span = self.last - self.first
+            rate = (self.tokens - 1) / span if span > 0 else None
+        return {
+            "ttft_sec": ttft,
+            "tokens_per_sec": rate,
+            "stream_tokens": self.tokens,
+        }
+
+
+def _run_attempt(
+    task: Task,
+    prompt: str,
+    attempt: int,
+    model_client: Any,
+    model_name: str,
+    repo_root: Path,
+    min_coverage: float,
+    arbiter: Any | None,
+    continue_on_error: bool,
+    py_grader: Any | None,
+    stream: bool = False,
+    early_abort: bool = False,
+) -> tuple[dict[str, Any], float, str]:
+    attempt_start = time.time()
+    model_error = None
+    stream_abort = None
+    make_check = STREAM_CHECKS.get(task.task_type) if early_abort else None
+    check = make_check() if make_check is not None else None
+    timer = TokenTimer(check) if stream or check is not None else None
+    meta: dict[str, Any] = {}
+    kwargs: dict[str, Any] = {"on_meta": meta.update}
+    if timer is not None:
+        kwargs["on_token"] = timer
+    try:
+        output = model_client.generate(
+            prompt, model_name, task.task_type, task.task_id, attempt=attempt, **kwargs
+        )
+    except StreamAborted as exc:
+        # Graded on the partial text, which already fails the broken check.
+        output = exc.text
+        stream_abort = exc.reason
+    except Exception as exc:
+        if not continue_on_error:
+            raise
+        model_error = f"{type(exc).__name__}: {exc}"
+        output = ""
+    generation_sec = time.time() - attempt_start
+    grade = grade_output(task, output, repo_root, min_coverage, arbiter, py_grader)
+    attempt_end = time.time()
+    attempt_result = {
+        "attempt": attempt,
+        "passed": grade["passed"],
+        "details": grade,
+        "output_chars": len(output),
+        "model_error": model_error,
+        "generation_sec": generation_sec,
+        "elapsed_sec": attempt_end - attempt_start,
+        "usage": meta.pop("usage", None),
+        # Whatever else the adapter reported: endpoint, requests, retries, ...
+        "adapter_meta": meta or None,
+    }
+    if timer is not None:
+        attempt_result.update(timer.metrics())
+    if check is not None:
+        attempt_result["stream_abort"] = stream_abort
+    return attempt_result, attempt_end, output
+
+
+def _settle(
+    task: Task,
+    model_name: str,
+    run: tuple[dict[str, Any], float, str],
+    on_attempt: Callable[[Task, str, dict[str, Any], str], None] | None,
+) -> tuple[dict[str, Any], float]:
+    """Fold in a pending arbiter verdict, then report the finished attempt."""
+    attempt_result, attempt_end, output = run
+    attempt_result["passed"] = resolve_verdict(attempt_result["details"])["passed"]
+    if on_attempt is not None:
+        on_attempt(task, model_name, attempt_result, output)
+    return attempt_result, attempt_end
+
+
 def evaluate_task(
     task: Task,
     model_client: Any,
@@ -72,67 +228,134 @@ def evaluate_task(
     min_coverage: float = 90.0,
     arbiter: Any | None = None,
     continue_on_error: bool = False,
+    parallel_attempts: bool = False,
+    on_attempt: Callable[[Task, str, dict[str, Any], str], None] | None = None,
+    py_grader: Any | None = None,
+    resume_from: list[tuple[dict[str, Any], float]] | None = None,
+    adaptive: str = "off",
+    adaptive_width: float = 0.5,
+    min_tries: int = 2,
+    stream: bool = False,
+    early_abort: bool = False,
+) -> dict[str, Any]:
+    """Run up to ``max_tries`` attempts of a task and summarize them.
+
+    ``resume_from`` holds attempts finished by an earlier, interrupted run as
+    (attempt_result, seconds since that task started); only the missing
+    attempt indices are run again.
+
+    With ``adaptive`` set to ``ci`` or ``passk`` attempts run one at a time
+    and stop early once :func:`harness.stats.should_stop_sampling` says the
+    task is settled.
+
+    ``stream`` asks the model client to stream and records time to first
+    token and tokens/sec per attempt (see :class:`TokenTimer`).
+    ``early_abort`` streams task types with a :data:`STREAM_CHECKS` entry
+    and cancels an attempt as soon as it can no longer pass, recording the
+    reason as ``stream_abort``.
+    """
+    resumed = sorted(resume_from or [], key=lambda item: item[0]["attempt"])
+    # Shift the earlier attempts onto this run's clock so the task's elapsed
+    # time does not include the time between the two runs.
+    start_time = time.time() - max((offset for _, offset in resumed), default=0.0)
+    done = {attempt_result["attempt"] for attempt_result, _ in resumed}
+    remaining = [a for a in range(1, max_tries + 1) if a not in done]
+    prompt = build_prompt(task)
+    attempt_args = (
+        model_client,
+        model_name,
+        repo_root,
+        min_coverage,
+        arbiter,
+        continue_on_error,
+        py_grader,
+        stream,
+        early_abort,
+    )
+
+    def settle(run: tuple[dict[str, Any], float, str]) -> tuple[dict[str, Any], float]:
+        return _settle(task, model_name, run, on_attempt)
+
+    finished = [(result, start_time + offset) for result, offset in resumed]
+    if adaptive != "off":
+        passed = [attempt_result["passed"] for attempt_result, _ in finished]
+        for attempt in remaining:
+            if should_stop_sampling(passed, adaptive, adaptive_width, min_tries):
+                break
+            finished.append(settle(_run_attempt(task, prompt, attempt, *attempt_args)))
+            passed.append(finished[-1][0]["passed"])
+    elif parallel_attempts and len(remaining) > 1:
+        # Samples are independent, so generate and grade them concurrently;
+        # metrics below still read attempts in index order.
+        with ThreadPoolExecutor(max_workers=len(remaining)) as pool:
+            futures = [
+                pool.submit(_run_attempt, task, prompt, attempt, *attempt_args)
+                for attempt in remaining
+            ]
+            finished.extend(settle(future.result()) for future in futures)
+    else:
+        # An attempt's arbiter verdict is collected after the next attempt
+        # has been generated, so the two overlap.
+        pending = None
+        for attempt in remaining:
+            try:
+                run = _run_attempt(task, prompt, attempt, *attempt_args)
+            finally:
+                # Settle (and journal) the previous attempt even if this
+                # generation raises, so a resumed run does not redo it.
+                if pending is not None:
+                    finished.append(settle(pending))
+            pending = run
+        if pending is not None:
+            finished.append(settle(pending))
+    finished.sort(key=lambda item: item[0]["attempt"])
+    # Time-to-fix follows attempt index, not completion order: under
+    # --parallel-attempts a fast attempt 2 can finish before a slow attempt 1.
+    # Each attempt ends after its own and all earlier attempts' durations.
+    clock = 0.0
+    ordered = []
+    for attempt_result, _ in finished:
+        clock += float(attempt_result.get("elapsed_sec") or 0.0)
+        ordered.append((attempt_result, clock))
+
+    return summarize_attempts(
+        task, model_name, ordered, max_tries, time.time() - start_time
+    )
+
+
+def summarize_attempts(
+    task: Task,
+    model_name: str,
+    finished: list[tuple[dict[str, Any], float]],
+    max_tries: int,
+    elapsed_sec: float,
 ) -> dict[str, Any]:
-    attempts = []
+    """Build a task result from (attempt_result, end_time) pairs in attempt order."""
+    attempts = [attempt_result for attempt_result, _ in finished]
     first_failure_time: float | None = None
     first_pass_time: float | None = None
-    start_time = time.time()
     pass_count = 0
-
-    for attempt in range(1, max_tries + 1):
-        attempt_start = time.time()
-        prompt = build_prompt(task)
-        model_error = None
-        try:
-            output = model_client.generate(
-                prompt, model_name, task.task_type, task.task_id
-            )
-        except Exception as exc:
-            if not continue_on_error:
-                raise
-            model_error = f"{type(exc).__name__}: {exc}"
-            output = ""
-        if task.task_type == "py":
-            grade = grade_py.evaluate(
-                task.path,
-                output,
-                repo_root=repo_root,
-                min_coverage=min_coverage,
-            )
-        elif task.task_type == "md":
-            grade = grade_md.evaluate(task.path, output, arbiter=arbiter)
-        elif task.task_type == "lean":
-            grade = grade_lean.evaluate(task.path, output, arbiter=arbiter)
-        else:
-            grade = grade_synth.evaluate(task.path, output, arbiter=arbiter)
-
-        attempt_end = time.time()
-        if grade["passed"]:
+    for attempt_result, attempt_end in finished:
+        if attempt_result["passed"]:
             pass_count += 1
             if first_pass_time is None:
                 first_pass_time = attempt_end
         elif first_failure_time is None:
             first_failure_time = attempt_end
 
-        attempt_result = {
-            "attempt": attempt,
-            "passed": grade["passed"],
-            "details": grade,
-            "output_chars": len(output),
-            "model_error": model_error,
-            "elapsed_sec": attempt_end - attempt_start,
-        }
-        attempts.append(attempt_result)
+    usage: Counter[str] = Counter()
+    for attempt_result in attempts:
+        usage.update(attempt_result.get("usage") or {})
 
-    end_time = time.time()
     pass_at_1 = bool(attempts and attempts[0]["passed"])
     pass_at_k = pass_count > 0
-    pass_rate = pass_count / max_tries if max_tries else 0.0
+    # Early-stopped tasks are scored on the attempts they actually used.
+    pass_rate = pass_count / len(attempts) if attempts else 0.0
     time_to_fix = None
     if pass_at_1:
         time_to_fix = 0.0
     elif first_pass_time is not None and first_failure_time is not None:
-        time_to_fix = first_pass_time - first_failure_time
+        time_to_fix = max(first_pass_time - first_failure_time, 0.0)
 
     return {
         "task_id": task.task_id,
@@ -143,6 +366,8 @@ def evaluate_task(
         "pass_at_k": pass_at_k,
         "pass_rate": pass_rate,
         "attempts_total": max_tries,
+        "attempts_used": len(attempts),
         "time_to_fix": time_to_fix,
-        "elapsed_sec": end_time - start_time,
+        "elapsed_sec": elapsed_sec,
+        "usage": dict(usage) if usage else None,
     }
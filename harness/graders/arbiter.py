@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any
+
+from harness.cache import VerdictCache
+
+
+def arbiter_prompt(task_text: str, answer: str) -> str:
+    return (
+        "You are a strict grader. Output only PASS or FAIL.\n\n"
+        "Task:\n"
+        f"{task_text}\n\n"
+        "Answer:\n"
+        f"{answer}\n"
+    )
+
+
+def parse_verdict(reply: str) -> bool:
+    reply_upper = reply.strip().upper()
+    if "PASS" in reply_upper and "FAIL" not in reply_upper:
+        return True
+    if "FAIL" in reply_upper and "PASS" not in reply_upper:
+        return False
+    return False
+
+
+def ask(task_text: str, answer: str, client: Any) -> bool:
+    """Ask the arbiter for a verdict and wait for it."""
+    reply = client.generate(
+        arbiter_prompt(task_text, answer),
+        model="arbiter",
+        task_type="arbiter",
+        task_id="md",
+    )
+    return parse_verdict(reply)
+
+
+def arbiter_identity(client: Any) -> Any:
+    """What makes two arbiters interchangeable for caching: command and sampling."""
+    params = getattr(client, "sampling_params", None)
+    if callable(params):
+        return params()
+    return type(client).__name__
+
+
+class ArbiterPool:
+    """Runs arbiter calls on background threads.
+
+    Graders hand their verdict request to :meth:`submit` and return the
+    heuristic part of the grade straight away; the harness resolves the
+    verdict later, so the arbiter overlaps with the next generation instead
+    of adding to it. ``always_run`` asks for verdicts even on answers the
+    heuristics already failed (see :func:`request_verdict`). With a ``cache``,
+    a verdict already given for the same arbiter, task text and answer is
+    reused. Everything else is delegated to the wrapped client.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        workers: int = 8,
+        always_run: bool = False,
+        cache: VerdictCache | None = None,
+        cache_mode: str = "off",
+    ) -> None:
+        self.client = client
+        self.always_run = always_run
+        self.cache = cache
+        self.cache_mode = cache_mode if cache is not None else "off"
+        self.identity = arbiter_identity(client)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="arbiter"
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    def submit(self, task_text: str, answer: str) -> Future[bool]:
+        key = None
+        if self.cache is not None and self.cache_mode != "off":
+            key = self.cache.key(
+                self.identity, arbiter_prompt("", ""), task_text, answer
+            )
+            if self.cache_mode in ("read", "readwrite"):
+                cached = self.cache.get(key)
+                if isinstance(cached, bool):
+                    done: Future[bool] = Future()
+                    done.set_result(cached)
+                    return done
+        return self._executor.submit(self._ask, task_text, answer, key)
+
+    def _ask(self, task_text: str, answer: str, key: str | None) -> bool:
+        verdict = ask(task_text, answer, self.client)
+        if key is not None and self.cache_mode in ("write", "readwrite"):
+            assert self.cache is not None
+            self.cache.put(key, verdict)
+        return verdict
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def request_verdict(
+    task_text: str,
+    answer: str,
+    arbiter: Any | None,
+    heuristics_pass: bool = True,
+) -> bool | Future[bool] | None:
+    """Verdict for an answer: None without an arbiter, a Future with a pool.
+
+    Grading runs cheap heuristics first. A failed heuristic already decides
+    the outcome, so the arbiter is only asked about such answers when it has
+    ``always_run`` set, e.g. for calibration studies; otherwise None.
+    """
+    if arbiter is None or not getattr(arbiter, "cmd_template", None):
+        return None
+    if not heuristics_pass and not getattr(arbiter, "always_run", False):
+        return None
+    submit = getattr(arbiter, "submit", None)
+    if submit is not None:
+        return submit(task_text, answer)
+    return ask(task_text, answer, arbiter)
+
+
+def combine(heuristics_pass: bool, arbiter_pass: bool | Future[bool] | None) -> bool:
+    """Grade outcome so far; a pending verdict is folded in by resolve_verdict."""
+    if isinstance(arbiter_pass, bool):
+        return heuristics_pass and arbiter_pass
+    return heuristics_pass
+
+
+def resolve_verdict(details: dict[str, Any]) -> dict[str, Any]:
+    """Wait for a pending arbiter verdict and fold it into ``passed``."""
+    pending = details.get("arbiter_pass")
+    if isinstance(pending, Future):
+        verdict = pending.result()
+        details["arbiter_pass"] = verdict
+        details["passed"] = details["passed"] and verdict
+    return details
@@ -4,7 +4,8 @@ import re
 from pathlib import Path
 from typing import Any
 
-from harness.graders.grade_md import _arbiter_verdict, _match_pattern
+from harness.graders.arbiter import combine, request_verdict
+from harness.graders.rubric import load_rubric
 
 
 def _parse_rubric(task_text: str) -> dict[str, list[str]]:
@@ -25,30 +26,42 @@ def _parse_rubric(task_text: str) -> dict[str, list[str]]:
     return {"must": must, "should": should}
 
 
+class StreamCheck:
+    """``code_fence`` once the streamed deltas contain one; the answer then fails.
+
+    Only the last two characters are kept to catch a fence split across deltas.
+    """
+
+    def __init__(self) -> None:
+        self.tail = ""
+
+    def __call__(self, delta: str) -> str | None:
+        text = self.tail + delta
+        self.tail = text[-2:]
+        return "code_fence" if "```" in text else None
+
+
+def stream_violation(partial: str) -> str | None:
+    """The :class:`StreamCheck` verdict on a whole streamed prefix."""
+    return StreamCheck()(partial)
+
+
 def evaluate(
     task_path: Path,
     answer: str,
     arbiter: Any | None = None,
 ) -> dict[str, Any]:
-    task_text = Path(task_path).read_text(encoding="utf-8")
-    rubric = _parse_rubric(task_text)
+    rubric = load_rubric(task_path, _parse_rubric)
+    task_text = rubric.task_text
 
-    missing = [p for p in rubric["must"] if not _match_pattern(p, answer)]
-    should_hits = sum(1 for p in rubric["should"] if _match_pattern(p, answer))
+    missing, should_hits = rubric.check(answer)
 
     length_ok = len(answer.strip()) >= 80
     fence_ok = "```" not in answer
 
     heuristics_pass = not missing and length_ok and fence_ok
-    arbiter_pass = None
-    if arbiter is not None and getattr(arbiter, "cmd_template", None):
-        arbiter_pass = _arbiter_verdict(task_text, answer, arbiter)
-
-    passed = (
-        heuristics_pass
-        if arbiter_pass is None
-        else (heuristics_pass and arbiter_pass)
-    )
+    arbiter_pass = request_verdict(task_text, answer, arbiter, heuristics_pass)
+    passed = combine(heuristics_pass, arbiter_pass)
 
     return {
         "passed": passed,
@@ -4,9 +4,12 @@ import re
 import shutil
 import subprocess
 import tempfile
+import time
 from pathlib import Path
 from typing import Any
 
+from harness.graders import patching
+
 ALLOWED_FILES = {"impl.py", "tests.py"}
 
 
@@ -26,7 +29,7 @@ def _copy_repo_config(repo_root: Path, dest: Path) -> None:
 
 def _extract_patch_paths(patch_text: str) -> list[str]:
     paths: list[str] = []
-    for line in patch_text.splitlines():
+    for line in patch_text.split("\n"):
         if line.startswith("+++ ") or line.startswith("--- "):
             path = line[4:].strip().split("\t", 1)[0]
             if path == "/dev/null":
@@ -57,22 +60,7 @@ def _patch_is_safe(patch_text: str) -> tuple[bool, str]:
 
 
 def _apply_patch(task_dir: Path, patch_text: str) -> tuple[bool, str]:
-    with tempfile.NamedTemporaryFile(mode="w", delete=False) as tmp:
-        tmp.write(patch_text)
-        patch_path = tmp.name
-
-    for strip in (0, 1):
-        result = subprocess.run(
-            ["patch", f"-p{strip}", "-i", patch_path, "-s"],
-            cwd=task_dir,
-            capture_output=True,
-            text=True,
-            check=False,
-        )
-        if result.returncode == 0:
-            return True, ""
-
-    return False, result.stderr.strip() or result.stdout.strip()
+    return patching.apply_patch(task_dir, patch_text)
 
 
 def _parse_coverage(report_text: str) -> float | None:
@@ -87,6 +75,8 @@ def evaluate(
     patch_text: str,
     repo_root: Path | None = None,
     min_coverage: float = 90.0,
+    sandbox_pool: Any | None = None,
+    timeout: float | None = None,
 ) -> dict[str, Any]:
     repo_root = _find_repo_root(task_dir) if repo_root is None else repo_root
 
@@ -100,7 +90,7 @@ def evaluate(
 
     added = 0
     removed = 0
-    for line in patch_text.splitlines():
+    for line in patch_text.split("\n"):
         if line.startswith("+++") or line.startswith("---"):
             continue
         if line.startswith("+"):
@@ -108,48 +98,121 @@ def evaluate(
         elif line.startswith("-"):
             removed += 1
 
+    if sandbox_pool is not None:
+        with sandbox_pool.checkout(task_dir) as task_copy:
+            return _grade_sandbox(
+                task_copy,
+                patch_text,
+                added + removed,
+                min_coverage,
+                sandbox_pool,
+                timeout,
+            )
+
     with tempfile.TemporaryDirectory() as tmpdir:
         tmp_path = Path(tmpdir)
         task_copy = tmp_path / "task"
         shutil.copytree(task_dir, task_copy)
         _copy_repo_config(repo_root, task_copy)
+        return _grade_sandbox(
+            task_copy, patch_text, added + removed, min_coverage, timeout=timeout
+        )
+
+
+def _output_text(value: str | bytes | None) -> str:
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value or ""
+
+
+def _remaining(deadline: float | None) -> float | None:
+    return None if deadline is None else max(deadline - time.monotonic(), 0.0)
 
-        applied, error = _apply_patch(task_copy, patch_text)
-        if not applied:
-            return {
-                "passed": False,
-                "patch_applied": False,
-                "patch_error": error,
-                "edit_lines": added + removed,
-            }
 
+def _run_tests(
+    task_copy: Path,
+    sandbox_pool: Any | None,
+    deadline: float | None,
+) -> tuple[int, str, str, str, bool]:
+    if sandbox_pool is not None and sandbox_pool.warm_tests:
+        reply = sandbox_pool.run_tests(task_copy, _remaining(deadline))
+        return (
+            reply["returncode"],
+            reply.get("stdout", ""),
+            reply.get("stderr", ""),
+            reply.get("coverage_report", ""),
+            bool(reply.get("timed_out")),
+        )
+
+    try:
         cov_run = subprocess.run(
             ["python", "-m", "coverage", "run", "-m", "pytest", "-q", "--maxfail=1"],
             cwd=task_copy,
             capture_output=True,
             text=True,
             check=False,
+            timeout=_remaining(deadline),
         )
-        tests_ok = cov_run.returncode == 0
-
+    except subprocess.TimeoutExpired as exc:
+        return -1, _output_text(exc.stdout), _output_text(exc.stderr), "", True
+    try:
         cov_report = subprocess.run(
             ["python", "-m", "coverage", "report", "-m"],
             cwd=task_copy,
             capture_output=True,
             text=True,
             check=False,
+            timeout=_remaining(deadline),
         )
-        coverage_percent = _parse_coverage(cov_report.stdout)
-        coverage_ok = coverage_percent is not None and coverage_percent >= min_coverage
+    except subprocess.TimeoutExpired:
+        stderr = f"{cov_run.stderr}coverage report timed out\n"
+        return cov_run.returncode, cov_run.stdout, stderr, "", True
+    return cov_run.returncode, cov_run.stdout, cov_run.stderr, cov_report.stdout, False
+
+
+def _grade_sandbox(
+    task_copy: Path,
+    patch_text: str,
+    edit_lines: int,
+    min_coverage: float,
+    sandbox_pool: Any | None = None,
+    timeout: float | None = None,
+) -> dict[str, Any]:
+    applied, error = _apply_patch(task_copy, patch_text)
+    if not applied:
+        return {
+            "passed": False,
+            "patch_applied": False,
+            "patch_error": error,
+            "edit_lines": edit_lines,
+        }
 
+    # One deadline covers tests, coverage report and lint for the attempt.
+    deadline = None if timeout is None else time.monotonic() + timeout
+    returncode, pytest_output, pytest_error, report, timed_out = _run_tests(
+        task_copy, sandbox_pool, deadline
+    )
+    tests_ok = returncode == 0 and not timed_out
+    coverage_percent = _parse_coverage(report)
+    coverage_ok = coverage_percent is not None and coverage_percent >= min_coverage
+
+    ruff_cmd = ["python", "-m", "ruff"]
+    if sandbox_pool is not None:
+        ruff_cmd = sandbox_pool.ruff_cmd
+    try:
         ruff_run = subprocess.run(
-            ["python", "-m", "ruff", "check", "."],
+            [*ruff_cmd, "check", "."],
             cwd=task_copy,
             capture_output=True,
             text=True,
             check=False,
+            timeout=_remaining(deadline),
         )
         ruff_ok = ruff_run.returncode == 0
+        ruff_output, ruff_error = ruff_run.stdout, ruff_run.stderr
+    except subprocess.TimeoutExpired as exc:
+        ruff_ok = False
+        ruff_output, ruff_error = _output_text(exc.stdout), "ruff timed out"
 
     passed = tests_ok and coverage_ok and ruff_ok
 
@@ -158,12 +221,13 @@ def evaluate(
         "patch_applied": True,
         "patch_error": None,
         "tests_ok": tests_ok,
+        "tests_timed_out": timed_out,
         "coverage_percent": coverage_percent,
         "coverage_ok": coverage_ok,
         "ruff_ok": ruff_ok,
-        "pytest_output": cov_run.stdout.strip(),
-        "pytest_error": cov_run.stderr.strip(),
-        "ruff_output": ruff_run.stdout.strip(),
-        "ruff_error": ruff_run.stderr.strip(),
-        "edit_lines": added + removed,
+        "pytest_output": pytest_output.strip(),
+        "pytest_error": pytest_error.strip(),
+        "ruff_output": ruff_output.strip(),
+        "ruff_error": ruff_error.strip(),
+        "edit_lines": edit_lines,
     }
@@ -4,39 +4,82 @@ import re
 from pathlib import Path
 from typing import Any
 
-from harness.graders.grade_md import _arbiter_verdict, _match_pattern, _parse_rubric
+from harness.graders.arbiter import combine, request_verdict
+from harness.graders.grade_md import _parse_rubric
+from harness.graders.rubric import load_rubric
+
+MAX_WORDS = 220
+MAX_PARAGRAPHS = 2
 
 
 def _word_count(text: str) -> int:
     return len(re.findall(r"[A-Za-z0-9']+", text))
 
 
+def _paragraphs(text: str) -> list[str]:
+    return [p for p in text.split("\n\n") if p.strip()]
+
+
+class StreamCheck:
+    """Hard limits the answer has already broken, fed one streamed delta at a time.
+
+    Words and paragraphs only ever grow as text is appended, so once over
+    the limit the answer cannot pass. Counts are kept running, so each delta
+    costs time in its own length rather than in the length of the answer.
+    """
+
+    def __init__(self) -> None:
+        self.words = 0
+        # Trailing word that the next delta may still extend.
+        self.partial_word = ""
+        self.paragraphs = 0
+        self.in_paragraph = False
+        # A trailing newline that may start a "\n\n" break with the next delta.
+        self.newline = False
+
+    def __call__(self, delta: str) -> str | None:
+        text = self.partial_word + delta
+        words = re.findall(r"[A-Za-z0-9']+", text)
+        self.partial_word = words.pop() if re.search(r"[A-Za-z0-9']\Z", text) else ""
+        self.words += len(words)
+        if self.words + bool(self.partial_word) > MAX_WORDS:
+            return f"word_count>{MAX_WORDS}"
+
+        chunks = (("\n" if self.newline else "") + delta).split("\n\n")
+        for chunk in chunks[:-1]:
+            if self.in_paragraph or chunk.strip():
+                self.paragraphs += 1
+            self.in_paragraph = False
+        self.in_paragraph = self.in_paragraph or bool(chunks[-1].strip())
+        self.newline = chunks[-1].endswith("\n")
+        if self.paragraphs + self.in_paragraph > MAX_PARAGRAPHS:
+            return f"paragraphs>{MAX_PARAGRAPHS}"
+        return None
+
+
+def stream_violation(partial: str) -> str | None:
+    """The :class:`StreamCheck` verdict on a whole streamed prefix."""
+    return StreamCheck()(partial)
+
+
 def evaluate(
     task_path: Path,
     answer: str,
     arbiter: Any | None = None,
 ) -> dict[str, Any]:
-    task_text = Path(task_path).read_text(encoding="utf-8")
-    rubric = _parse_rubric(task_text)
+    rubric = load_rubric(task_path, _parse_rubric)
+    task_text = rubric.task_text
 
-    missing = [p for p in rubric["must"] if not _match_pattern(p, answer)]
-    should_hits = sum(1 for p in rubric["should"] if _match_pattern(p, answer))
+    missing, should_hits = rubric.check(answer)
 
     words = _word_count(answer)
-    paragraphs = [p for p in answer.split("\n\n") if p.strip()]
-    paragraphs_ok = 1 <= len(paragraphs) <= 2
-    length_ok = 40 <= words <= 220
+    paragraphs = _paragraphs(answer)
+    paragraphs_ok = 1 <= len(paragraphs) <= MAX_PARAGRAPHS
+    length_ok = 40 <= words <= MAX_WORDS
 
     heuristics_pass = not missing and length_ok and paragraphs_ok
-    arbiter_pass = None
-    if arbiter is not None and getattr(arbiter, "cmd_template", None):
-        arbiter_pass = _arbiter_verdict(task_text, answer, arbiter)
-
-    passed = (
-        heuristics_pass
-        if arbiter_pass is None
-        else (heuristics_pass and arbiter_pass)
-    )
+    arbiter_pass = request_verdict(task_text, answer, arbiter, heuristics_pass)
+    passed = combine(heuristics_pass, arbiter_pass)
 
     return {
         "passed": passed,
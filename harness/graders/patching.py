@@ -0,0 +1,357 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+DEV_NULL = "/dev/null"
+
+
+class PatchError(Exception):
+    pass
+
+
+@dataclass
+class Hunk:
+    old_start: int
+    old_len: int
+    new_start: int
+    new_len: int
+    lines: list[str] = field(default_factory=list)
+    old_eof_newline: bool = True
+    new_eof_newline: bool = True
+
+    @property
+    def old_lines(self) -> list[str]:
+        return [line[1:] for line in self.lines if line[0] in " -"]
+
+    @property
+    def new_lines(self) -> list[str]:
+        return [line[1:] for line in self.lines if line[0] in " +"]
+
+
+@dataclass
+class FilePatch:
+    old_path: str
+    new_path: str
+    hunks: list[Hunk] = field(default_factory=list)
+
+
+def _split_lines(text: str) -> list[str]:
+    """Split on "\n" only, keeping line endings.
+
+    Unlike ``str.splitlines``, "\f", "\x1c"-"\x1e", "\u2028" and lone "\r"
+    stay inside their line, as GNU patch sees them.
+    """
+    lines = [line + "\n" for line in text.split("\n")]
+    last = lines.pop()[:-1]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def _content(line: str) -> str:
+    """``line`` without its "\n" or "\r\n" ending."""
+    if line.endswith("\n"):
+        line = line[:-1]
+        if line.endswith("\r"):
+            line = line[:-1]
+    return line
+
+
+def _header_path(line: str) -> str:
+    return line[4:].rstrip("\n").split("\t", 1)[0].strip()
+
+
+def _mark_no_newline(hunk: Hunk) -> None:
+    # "\ No newline at end of file" applies to the line before it.
+    last = hunk.lines[-1][0] if hunk.lines else " "
+    if last in " -":
+        hunk.old_eof_newline = False
+    if last in " +":
+        hunk.new_eof_newline = False
+
+
+def parse_patch(text: str) -> list[FilePatch]:
+    """Parse a unified diff into per-file hunks."""
+    lines = [_content(line) for line in _split_lines(text)]
+    patches: list[FilePatch] = []
+    i = 0
+    while i < len(lines):
+        line = lines[i]
+        if not (line.startswith("--- ") and i + 1 < len(lines)):
+            i += 1
+            continue
+        if not lines[i + 1].startswith("+++ "):
+            i += 1
+            continue
+        current = FilePatch(_header_path(line), _header_path(lines[i + 1]))
+        patches.append(current)
+        i += 2
+        while i < len(lines) and lines[i].startswith("@@"):
+            match = _HUNK_HEADER.match(lines[i])
+            if not match:
+                raise PatchError(f"malformed hunk header: {lines[i]}")
+            old_start, old_len, new_start, new_len = (
+                int(match.group(1)),
+                int(match.group(2) or 1),
+                int(match.group(3)),
+                int(match.group(4) or 1),
+            )
+            hunk = Hunk(old_start, old_len, new_start, new_len)
+            i += 1
+            old_seen = new_seen = 0
+            while old_seen < old_len or new_seen < new_len:
+                if i >= len(lines):
+                    raise PatchError(
+                        f"truncated hunk #{len(current.hunks) + 1} "
+                        f"in {current.new_path}"
+                    )
+                body = lines[i]
+                if body == "":
+                    # Blank context lines often lose their leading space.
+                    body = " "
+                tag = body[0]
+                if tag == "\\":
+                    _mark_no_newline(hunk)
+                    i += 1
+                    continue
+                if tag not in " -+":
+                    raise PatchError(
+                        f"malformed hunk #{len(current.hunks) + 1} "
+                        f"in {current.new_path}: {lines[i]!r}"
+                    )
+                if tag in " -":
+                    old_seen += 1
+                if tag in " +":
+                    new_seen += 1
+                hunk.lines.append(body)
+                i += 1
+            while i < len(lines) and lines[i].startswith("\\"):
+                _mark_no_newline(hunk)
+                i += 1
+            current.hunks.append(hunk)
+    return patches
+
+
+def _strip_path(path: str, level: int) -> str:
+    if path == DEV_NULL:
+        return path
+    parts = path.split("/")
+    return "/".join(parts[level:])
+
+
+def _target(patch: FilePatch, level: int) -> str:
+    if patch.new_path != DEV_NULL:
+        return _strip_path(patch.new_path, level)
+    return _strip_path(patch.old_path, level)
+
+
+def detect_strip_level(patches: list[FilePatch], root: Path) -> int | None:
+    """Pick the smallest -p level at which every patched file resolves."""
+    for level in (0, 1):
+        ok = True
+        for patch in patches:
+            target = _target(patch, level)
+            if not target:
+                ok = False
+                break
+            creating = patch.old_path == DEV_NULL
+            if not creating and not (root / target).is_file():
+                ok = False
+                break
+        if ok:
+            return level
+    return None
+
+
+def _leading_context(hunk: Hunk) -> int:
+    count = 0
+    for line in hunk.lines:
+        if line[0] != " ":
+            break
+        count += 1
+    return count
+
+
+def _trailing_context(hunk: Hunk) -> int:
+    count = 0
+    for line in reversed(hunk.lines):
+        if line[0] != " ":
+            break
+        count += 1
+    return count
+
+
+def _matches(keys: list[str], old: list[str], where: int, head: int, tail: int) -> bool:
+    """Whether ``old`` minus ``head``/``tail`` lines matches at line ``where``."""
+    for i in range(head, len(old) - tail):
+        line = where - 1 + i
+        if not 0 <= line < len(keys) or keys[line] != old[i]:
+            return False
+    return True
+
+
+def _locate(
+    keys: list[str], hunk: Hunk, first_guess: int, last_frozen: int, fuzz: int
+) -> int | None:
+    """1-based line where ``hunk`` applies at ``fuzz``, as GNU patch finds it.
+
+    Fuzz drops outer context lines, more from the side with more context.
+    A hunk with less leading than trailing context at line 1 can only match
+    at the start of the file, and one with less trailing context only at the
+    end, since diff only shortens context there. Nearer positions are tried
+    first, later lines before earlier ones.
+    """
+    old = hunk.old_lines
+    prefix, suffix = _leading_context(hunk), _trailing_context(hunk)
+    context = max(prefix, suffix)
+    prefix_fuzz = fuzz + prefix - context
+    suffix_fuzz = fuzz + suffix - context
+    max_where = len(keys) - (len(old) - suffix_fuzz) + 1
+    min_where = last_frozen + 1
+    max_pos = max_where - first_guess
+    max_neg = min(first_guess - min_where, first_guess - 1)
+    if not old:
+        return first_guess
+    if prefix_fuzz < 0 and hunk.old_start <= 1:
+        if suffix_fuzz < 0 and (len(old) != len(keys) or prefix < last_frozen):
+            return None
+        offset = 1 - first_guess
+        if (
+            last_frozen <= prefix
+            and offset <= max_pos
+            and _matches(keys, old, 1, 0, max(suffix_fuzz, 0))
+        ):
+            return 1
+        return None
+    prefix_fuzz = max(prefix_fuzz, 0)
+    if suffix_fuzz < 0:
+        offset = first_guess - (len(keys) - len(old) + 1)
+        if offset <= max_neg and _matches(
+            keys, old, first_guess - offset, prefix_fuzz, 0
+        ):
+            return first_guess - offset
+        return None
+    for offset in range(max(max_pos, max_neg) + 1):
+        if offset <= max_pos and _matches(
+            keys, old, first_guess + offset, prefix_fuzz, suffix_fuzz
+        ):
+            return first_guess + offset
+        if (
+            0 < offset <= max_neg
+            and first_guess - offset <= max_where
+            and _matches(keys, old, first_guess - offset, prefix_fuzz, suffix_fuzz)
+        ):
+            return first_guess - offset
+    return None
+
+
+def _apply_hunks(
+    lines: list[str], hunks: list[Hunk], name: str, fuzz: int, newline: str
+) -> tuple[list[str], list[str]]:
+    """Apply ``hunks`` to ``lines`` (with endings) the way GNU patch does.
+
+    File lines are copied up to each change, so context keeps the file's text
+    and endings and may be shared with the next hunk; added lines get
+    ``newline``.
+    """
+    keys = [_content(line) for line in lines]
+    errors: list[str] = []
+    out: list[str] = []
+    frozen = 0  # file lines already copied or deleted
+    in_offset = 0
+    for number, hunk in enumerate(hunks, start=1):
+        # A zero-length old range names the line *after* which to insert.
+        first = hunk.old_start if hunk.old_len else hunk.old_start + 1
+        max_fuzz = min(fuzz, max(_leading_context(hunk), _trailing_context(hunk)))
+        where = None
+        for level in range(max_fuzz + 1):
+            where = _locate(keys, hunk, first + in_offset, frozen, level)
+            if where is not None:
+                break
+        # GNU patch aborts on hunks reaching back into lines already written.
+        if where is None or where - 1 + _leading_context(hunk) < frozen:
+            errors.append(f"hunk #{number} FAILED at {hunk.old_start} in {name}")
+            continue
+        in_offset = where - first
+        last_new = max(
+            (i for i, line in enumerate(hunk.lines) if line[0] in " +"), default=-1
+        )
+        line_no = where - 1
+        for i, line in enumerate(hunk.lines):
+            tag = line[0]
+            if tag == " ":
+                line_no += 1
+                continue
+            until = min(line_no, len(lines))
+            out.extend(lines[frozen:until])
+            frozen = max(frozen, until)
+            if tag == "-":
+                frozen += 1
+                line_no += 1
+                continue
+            text = line[1:] + newline
+            if i == last_new and not hunk.new_eof_newline:
+                text = line[1:]
+            out.append(text)
+    out.extend(lines[frozen:])
+    # Lines that end up before others need an ending, e.g. an old last line.
+    for i in range(len(out) - 1):
+        if not out[i].endswith("\n"):
+            out[i] += newline
+    return out, errors
+
+
+def apply_patch(root: Path, patch_text: str, fuzz: int = 2) -> tuple[bool, str]:
+    """Apply a unified diff to files under ``root`` in memory.
+
+    Files are only written once every hunk of every file applies, so a failed
+    patch leaves ``root`` untouched.
+    """
+    root = Path(root)
+    try:
+        patches = parse_patch(patch_text)
+    except PatchError as exc:
+        return False, str(exc)
+    if not patches:
+        return False, "no file patches found"
+    level = detect_strip_level(patches, root)
+    if level is None:
+        names = ", ".join(_target(p, 1) or p.new_path for p in patches)
+        return False, f"can't find file to patch: {names}"
+
+    resolved_root = root.resolve()
+    writes: dict[Path, str | None] = {}
+    errors: list[str] = []
+    for patch in patches:
+        name = _target(patch, level)
+        path = (root / name).resolve()
+        if not path.is_relative_to(resolved_root):
+            return False, f"patch escapes task directory: {name}"
+        if path in writes:
+            text = writes[path] or ""
+        elif patch.old_path == DEV_NULL:
+            text = ""
+        else:
+            text = path.read_text(encoding="utf-8")
+        newline = "\r\n" if "\r\n" in text else "\n"
+        new_lines, hunk_errors = _apply_hunks(
+            _split_lines(text), patch.hunks, name, fuzz, newline
+        )
+        errors.extend(hunk_errors)
+        if patch.new_path == DEV_NULL:
+            writes[path] = None
+            continue
+        writes[path] = "".join(new_lines)
+
+    if errors:
+        return False, "\n".join(errors)
+    for path, content in writes.items():
+        if content is None:
+            path.unlink(missing_ok=True)
+            continue
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8", newline="")
+    return True, ""
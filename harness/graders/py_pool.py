@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any
+
+from harness.graders import grade_py
+from harness.graders.sandbox import SandboxPool
+
+
+class PyGrader:
+    """Grades py attempts in-process, optionally with warm sandboxes."""
+
+    def __init__(
+        self,
+        repo_root: Path,
+        warm: bool = False,
+        timeout: float | None = None,
+        workers: int = 1,
+    ) -> None:
+        self.timeout = timeout
+        self.sandbox = SandboxPool(repo_root, workers=workers) if warm else None
+
+    def evaluate(
+        self,
+        task_dir: Path,
+        patch_text: str,
+        repo_root: Path | None = None,
+        min_coverage: float = 90.0,
+    ) -> dict[str, Any]:
+        return grade_py.evaluate(
+            task_dir,
+            patch_text,
+            repo_root=repo_root,
+            min_coverage=min_coverage,
+            sandbox_pool=self.sandbox,
+            timeout=self.timeout,
+        )
+
+    def close(self) -> None:
+        if self.sandbox is not None:
+            self.sandbox.close()
+
+
+_worker_grader: PyGrader | None = None
+
+
+def _init_worker(
+    base_root: str, repo_root: str, warm: bool, timeout: float | None
+) -> None:
+    global _worker_grader
+    # Every worker gets its own temp root so sandboxes never collide.
+    tempfile.tempdir = tempfile.mkdtemp(prefix=f"worker-{os.getpid()}-", dir=base_root)
+    _worker_grader = PyGrader(Path(repo_root), warm=warm, timeout=timeout)
+
+
+def _evaluate_in_worker(
+    task_dir: Path,
+    patch_text: str,
+    repo_root: Path | None,
+    min_coverage: float,
+) -> dict[str, Any]:
+    assert _worker_grader is not None
+    return _worker_grader.evaluate(
+        task_dir, patch_text, repo_root=repo_root, min_coverage=min_coverage
+    )
+
+
+class PyGraderPool:
+    """Runs grade_py in a pool of worker processes, one per CPU by default.
+
+    Workers are spawned rather than forked because the harness calls in from
+    several threads at once. If a worker dies, the pool is rebuilt and the
+    attempts it was grading fail with a ``grader_error``.
+    """
+
+    def __init__(
+        self,
+        repo_root: Path,
+        workers: int | None = None,
+        warm: bool = False,
+        timeout: float | None = None,
+    ) -> None:
+        self.workers = workers if workers and workers > 0 else os.cpu_count() or 1
+        self.timeout = timeout
+        self._root = tempfile.mkdtemp(prefix="local-eval-py-pool-")
+        self._initargs = (self._root, str(repo_root), warm, timeout)
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=self._initargs,
+        )
+
+    def evaluate(
+        self,
+        task_dir: Path,
+        patch_text: str,
+        repo_root: Path | None = None,
+        min_coverage: float = 90.0,
+    ) -> dict[str, Any]:
+        executor = self._executor
+        try:
+            future = executor.submit(
+                _evaluate_in_worker, task_dir, patch_text, repo_root, min_coverage
+            )
+            return future.result()
+        except BrokenProcessPool as exc:
+            with self._lock:
+                # Only the first caller to see this executor broken replaces it.
+                if self._executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self._executor = self._new_executor()
+            return {
+                "passed": False,
+                "grader_error": f"py grader worker died: {exc}",
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self._root, ignore_errors=True)
+
+
+def make_py_grader(
+    repo_root: Path,
+    workers: int = 0,
+    warm: bool = False,
+    timeout: float | None = None,
+    threads: int = 1,
+) -> PyGrader | PyGraderPool:
+    """Build the py grader for a run: inline when workers == 0, else a pool.
+
+    ``workers < 0`` sizes the pool to the CPU count.
+    """
+    if workers == 0:
+        return PyGrader(repo_root, warm=warm, timeout=timeout, workers=threads)
+    return PyGraderPool(
+        repo_root, workers=workers if workers > 0 else None, warm=warm, timeout=timeout
+    )
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from typing import Any
+
+import coverage
+import pytest
+
+PYTEST_ARGS = ["-q", "--maxfail=1"]
+
+
+def _child(cwd: str, out_path: str, err_path: str, result_path: str) -> None:
+    # Own process group, so a timeout also kills anything the tests spawned.
+    os.setpgid(0, 0)
+    os.chdir(cwd)
+    sys.path.insert(0, cwd)
+    with open(out_path, "w") as out_f, open(err_path, "w") as err_f:
+        os.dup2(out_f.fileno(), 1)
+        os.dup2(err_f.fileno(), 2)
+
+    cov = coverage.Coverage()
+    cov.start()
+    try:
+        code = pytest.main(PYTEST_ARGS)
+    finally:
+        cov.stop()
+        cov.save()
+    report = io.StringIO()
+    try:
+        cov.report(file=report, show_missing=True)
+    except coverage.CoverageException as exc:
+        report.write(f"{exc}\n")
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({"returncode": int(code), "coverage_report": report.getvalue()}, f)
+    sys.stdout.flush()
+    sys.stderr.flush()
+
+
+def _wait(pid: int, timeout: float | None) -> int | None:
+    """Wait for the job child; kill its process group and return None on timeout."""
+    if timeout is None:
+        return os.waitpid(pid, 0)[1]
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while True:
+        done, status = os.waitpid(pid, os.WNOHANG)
+        if done:
+            return status
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+    try:
+        os.killpg(pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    os.waitpid(pid, 0)
+    return None
+
+
+def run_job(job: dict[str, Any]) -> dict[str, Any]:
+    tmpdir = tempfile.mkdtemp(prefix="local-eval-py-")
+    out_path = os.path.join(tmpdir, "stdout")
+    err_path = os.path.join(tmpdir, "stderr")
+    result_path = os.path.join(tmpdir, "result.json")
+    try:
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _child(job["cwd"], out_path, err_path, result_path)
+            finally:
+                os._exit(0)
+        status = _wait(pid, job.get("timeout"))
+        reply: dict[str, Any] = {"returncode": 1, "coverage_report": ""}
+        if status is None:
+            reply["timed_out"] = True
+        elif os.path.exists(result_path):
+            with open(result_path, encoding="utf-8") as f:
+                reply.update(json.load(f))
+        elif os.WIFSIGNALED(status):
+            reply["returncode"] = -os.WTERMSIG(status)
+        for key, path in (("stdout", out_path), ("stderr", err_path)):
+            try:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    reply[key] = f.read()
+            except OSError:
+                reply[key] = ""
+        return reply
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def main() -> None:
+    """Serve jobs from stdin: one JSON job per line in, one JSON reply per line out.
+
+    pytest and coverage are imported once; each job runs in a forked child so
+    it starts from a clean module table without paying interpreter startup.
+    """
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        reply = run_job(json.loads(line))
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
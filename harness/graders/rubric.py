@@ -0,0 +1,172 @@
+from __future__ import annotations
+
+import re
+import threading
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+RubricParser = Callable[[str], dict[str, list[str]]]
+
+
+@dataclass(frozen=True)
+class RubricPattern:
+    raw: str
+    regex: re.Pattern[str] | None = None
+    literal: str | None = None
+
+    def matches(self, text: str, lowered: str) -> bool:
+        if self.regex is not None:
+            return self.regex.search(text) is not None
+        assert self.literal is not None
+        return self.literal in lowered
+
+
+@lru_cache(maxsize=4096)
+def compile_pattern(pattern: str) -> RubricPattern:
+    if pattern.startswith("re:"):
+        regex = pattern[3:].strip()
+        return RubricPattern(pattern, regex=re.compile(regex, flags=re.I | re.M))
+    if pattern.startswith("/") and pattern.endswith("/") and len(pattern) > 2:
+        regex = pattern[1:-1]
+        return RubricPattern(pattern, regex=re.compile(regex, flags=re.I | re.M))
+    return RubricPattern(pattern, literal=pattern.lower())
+
+
+class _AhoCorasick:
+    """Finds which of many literal needles occur in a text in one pass."""
+
+    def __init__(self, needles: list[str]) -> None:
+        self.goto: list[dict[str, int]] = [{}]
+        self.out: list[frozenset[int]] = []
+        outputs: list[set[int]] = [set()]
+        for idx, needle in enumerate(needles):
+            state = 0
+            for ch in needle:
+                nxt = self.goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self.goto)
+                    self.goto[state][ch] = nxt
+                    self.goto.append({})
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(idx)
+
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[nxt] = self.goto[fallback].get(ch, 0)
+                outputs[nxt] |= outputs[self.fail[nxt]]
+        self.out = [frozenset(o) for o in outputs]
+        self.size = len(needles)
+
+    def search(self, text: str) -> set[int]:
+        goto, fail, out = self.goto, self.fail, self.out
+        found: set[int] = set(out[0])
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                found |= out[state]
+                if len(found) == self.size:
+                    break
+        return found
+
+
+# Measured crossover on CPython: below this many literals, one C-level
+# substring scan per literal beats walking the automaton in Python. On a
+# ~38KB answer of random words: 30 literals 0.7ms scans vs 3.8ms automaton,
+# 150 3.4ms vs 6.8ms, 300 7.0ms vs 7.8ms, 400 9.6ms vs 7.8ms, 800 18.9ms vs 6.8ms.
+AUTOMATON_MIN_LITERALS = 400
+
+
+class PatternSet:
+    """Reports which of a list of rubric patterns match an answer.
+
+    The answer is lowered once per call. Literal patterns share one
+    Aho-Corasick pass once there are enough of them; regexes are precompiled
+    and searched individually, since CPython's backtracking engine runs a
+    merged alternation slower than separate prefix-optimised searches.
+    """
+
+    def __init__(self, patterns: tuple[RubricPattern, ...]) -> None:
+        self.patterns = patterns
+        self._literal_idx = [i for i, p in enumerate(patterns) if p.literal is not None]
+        self._regex_idx = [i for i, p in enumerate(patterns) if p.regex is not None]
+        self._automaton: _AhoCorasick | None = None
+        if len(self._literal_idx) >= AUTOMATON_MIN_LITERALS:
+            self._automaton = _AhoCorasick(
+                [patterns[i].literal or "" for i in self._literal_idx]
+            )
+
+    def hits(self, text: str) -> set[int]:
+        lowered = text.lower()
+        found: set[int] = set()
+        if self._automaton is not None:
+            found.update(self._literal_idx[i] for i in self._automaton.search(lowered))
+        else:
+            found.update(
+                i for i in self._literal_idx if self.patterns[i].matches(text, lowered)
+            )
+        found.update(
+            i for i in self._regex_idx if self.patterns[i].matches(text, lowered)
+        )
+        return found
+
+
+@dataclass(frozen=True)
+class Rubric:
+    """A task's rubric, parsed once with every pattern precompiled."""
+
+    task_text: str
+    must: tuple[RubricPattern, ...]
+    should: tuple[RubricPattern, ...]
+    matcher: PatternSet
+
+    def check(self, answer: str) -> tuple[list[str], int]:
+        """Return (missing must patterns, number of should hits) for an answer."""
+        hits = self.matcher.hits(answer)
+        missing = [p.raw for i, p in enumerate(self.must) if i not in hits]
+        offset = len(self.must)
+        should_hits = sum(1 for i in range(len(self.should)) if offset + i in hits)
+        return missing, should_hits
+
+
+_cache_lock = threading.Lock()
+_cache: dict[tuple[str, RubricParser], tuple[tuple[int, int], Rubric]] = {}
+
+
+def load_rubric(task_path: Path, parse: RubricParser) -> Rubric:
+    """Load a task's rubric, reusing the compiled copy while the file is unchanged."""
+    path = Path(task_path)
+    stat = path.stat()
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    key = (str(path.resolve()), parse)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    task_text = path.read_text(encoding="utf-8")
+    parsed = parse(task_text)
+    must = tuple(compile_pattern(p) for p in parsed["must"])
+    should = tuple(compile_pattern(p) for p in parsed["should"])
+    rubric = Rubric(
+        task_text=task_text,
+        must=must,
+        should=should,
+        matcher=PatternSet(must + should),
+    )
+    with _cache_lock:
+        _cache[key] = (stamp, rubric)
+    return rubric
@@ -0,0 +1,179 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _find_ruff() -> list[str]:
+    try:
+        from ruff.__main__ import find_ruff_bin
+
+        return [os.fsdecode(find_ruff_bin())]
+    except (ImportError, FileNotFoundError):
+        return [sys.executable, "-m", "ruff"]
+
+
+class _Sandbox:
+    def __init__(self, source: Path, path: Path, repo_root: Path) -> None:
+        self.path = path
+        shutil.copytree(source, path)
+        pyproject = repo_root / "pyproject.toml"
+        if pyproject.exists():
+            shutil.copy2(pyproject, path / "pyproject.toml")
+        self._snapshot: dict[Path, tuple[bytes, int, int]] = {}
+        for file in path.rglob("*"):
+            if file.is_file():
+                stat = file.stat()
+                self._snapshot[file] = (
+                    file.read_bytes(),
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                )
+
+    def reset(self) -> None:
+        """Restore the pristine copy: rewrite touched files, drop new ones."""
+        for file in sorted(self.path.rglob("*"), reverse=True):
+            if file in self._snapshot:
+                continue
+            if file.is_dir() and not file.is_symlink():
+                if not any(p.is_relative_to(file) for p in self._snapshot):
+                    shutil.rmtree(file, ignore_errors=True)
+            else:
+                file.unlink(missing_ok=True)
+        for file, (data, mtime_ns, size) in self._snapshot.items():
+            try:
+                stat = file.stat()
+                if (stat.st_mtime_ns, stat.st_size) == (mtime_ns, size):
+                    continue
+            except OSError:
+                file.parent.mkdir(parents=True, exist_ok=True)
+            file.write_bytes(data)
+            os.utime(file, ns=(mtime_ns, mtime_ns))
+
+
+class _Worker:
+    def __init__(self) -> None:
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in (str(PACKAGE_ROOT), env.get("PYTHONPATH")) if p
+        )
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "harness.graders.py_worker"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+
+    def run(self, cwd: Path, timeout: float | None = None) -> dict[str, Any]:
+        assert self.proc.stdin is not None and self.proc.stdout is not None
+        self.proc.stdin.write(json.dumps({"cwd": str(cwd), "timeout": timeout}) + "\n")
+        self.proc.stdin.flush()
+        line = self.proc.stdout.readline()
+        if not line:
+            raise RuntimeError("py worker exited unexpectedly")
+        return json.loads(line)
+
+    def close(self) -> None:
+        if self.proc.poll() is None:
+            assert self.proc.stdin is not None
+            self.proc.stdin.close()
+            try:
+                self.proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+
+
+class SandboxPool:
+    """Warm resources for grade_py: reusable task copies and test workers.
+
+    Each task directory is copied once; later attempts get the same copy back
+    after a reset that only rewrites what the previous attempt touched. Tests
+    run in long-lived worker interpreters with pytest and coverage imported
+    (POSIX only; elsewhere tests fall back to cold subprocesses).
+    """
+
+    def __init__(self, repo_root: Path, workers: int = 1) -> None:
+        self.repo_root = Path(repo_root)
+        self.root = Path(tempfile.mkdtemp(prefix="local-eval-sandboxes-"))
+        self.ruff_cmd = _find_ruff()
+        self.warm_tests = hasattr(os, "fork")
+        self._lock = threading.Lock()
+        self._idle: dict[Path, list[_Sandbox]] = {}
+        self._count = 0
+        self._workers: queue.Queue[_Worker] = queue.Queue()
+        self._all_workers: list[_Worker] = []
+        self._max_workers = max(1, workers)
+        # One permit per worker slot, held while a worker is checked out and
+        # released when it is returned or discarded, so a caller waiting for
+        # a slot wakes up either way.
+        self._slots = threading.BoundedSemaphore(self._max_workers)
+
+    @contextmanager
+    def checkout(self, task_dir: Path) -> Iterator[Path]:
+        source = Path(task_dir).resolve()
+        with self._lock:
+            idle = self._idle.setdefault(source, [])
+            sandbox = idle.pop() if idle else None
+            if sandbox is None:
+                self._count += 1
+                path = self.root / f"{self._count}" / "task"
+        if sandbox is None:
+            sandbox = _Sandbox(source, path, self.repo_root)
+        try:
+            yield sandbox.path
+        finally:
+            sandbox.reset()
+            with self._lock:
+                self._idle[source].append(sandbox)
+
+    def _checkout_worker(self) -> _Worker:
+        self._slots.acquire()
+        try:
+            return self._workers.get_nowait()
+        except queue.Empty:
+            pass
+        # Holding a slot with no idle worker means fewer than _max_workers
+        # exist, so there is room for a new one.
+        try:
+            worker = _Worker()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._all_workers.append(worker)
+        return worker
+
+    def run_tests(self, cwd: Path, timeout: float | None = None) -> dict[str, Any]:
+        """Run pytest under coverage in ``cwd`` on a warm worker."""
+        worker = self._checkout_worker()
+        try:
+            reply = worker.run(cwd, timeout)
+        except Exception:
+            worker.close()
+            with self._lock:
+                self._all_workers.remove(worker)
+            self._slots.release()
+            raise
+        self._workers.put(worker)
+        self._slots.release()
+        return reply
+
+    def close(self) -> None:
+        with self._lock:
+            workers, self._all_workers = self._all_workers, []
+        for worker in workers:
+            worker.close()
+        shutil.rmtree(self.root, ignore_errors=True)
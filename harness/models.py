@@ -1,9 +1,33 @@
 from __future__ import annotations
 
+import codecs
+import json
 import os
 import shlex
 import subprocess
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass
+from typing import Any
+
+from harness.cache import ResponseCache
+
+# Names the fd a model command may write JSON metadata to; see _meta_channel.
+META_FD_ENV = "LOCAL_EVAL_META_FD"
+
+# Environment knobs read by scripts/openai_cli.py that change what the model
+# returns; they are part of the response cache key in command-template mode.
+SAMPLING_ENV_VARS = (
+    "OPENAI_TEMPERATURE",
+    "OPENAI_MAX_OUTPUT_TOKENS",
+    "OPENAI_REASONING_EFFORT",
+    "OPENAI_API_BASE",
+    "OPENROUTER_API_BASE",
+    "OPENAI_FORCE_CHAT",
+    "OPENAI_FORCE_ENDPOINT",
+    "OPENROUTER_FORCE_ENDPOINT",
+)
 
 MOCK_ANSWERS: dict[str, str] = {
     "t01_bigO_edges": (
@@ -61,27 +85,110 @@ MOCK_ANSWERS: dict[str, str] = {
 }
 
 
+class StreamAborted(Exception):
+    """Raised from an ``on_token`` callback to cancel a generation mid-stream."""
+
+    def __init__(self, reason: str, text: str) -> None:
+        super().__init__(reason)
+        self.reason = reason
+        self.text = text
+
+
 @dataclass
 class ModelClient:
     cmd_template: str | None
     mock: bool = False
+    adapter: Any | None = None
+    cache: ResponseCache | None = None
+    cache_mode: str = "off"
+    # A ModelLimiter; held only around real calls, so cache hits skip it.
+    limiter: Any | None = None
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        task_type: str,
+        task_id: str,
+        attempt: int = 1,
+        on_token: Callable[[str], None] | None = None,
+        on_meta: Callable[[dict[str, Any]], None] | None = None,
+    ) -> str:
+        """Generate a completion; ``on_token`` receives the text as it streams.
 
-    def generate(self, prompt: str, model: str, task_type: str, task_id: str) -> str:
-        if self.mock or not self.cmd_template:
-            return self._mock_response(task_id, task_type, prompt)
+        Sources that cannot stream (mock answers, cache hits) hand the whole
+        text to ``on_token`` at once. ``on_meta`` receives what the adapter
+        reports about the call, such as token usage; cache hits and mock
+        answers report nothing.
+        """
+        if self.mock or not (self.cmd_template or self.adapter):
+            return _deliver(self._mock_response(task_id, task_type, prompt), on_token)
+        if self.cache is None or self.cache_mode == "off":
+            with self._slot(model):
+                return self._call(prompt, model, task_type, task_id, on_token, on_meta)
+
+        key = self.cache.key(model, prompt, self.sampling_params(), attempt)
+        if self.cache_mode in ("read", "readwrite"):
+            cached = self.cache.get(key)
+            if isinstance(cached, str):
+                return _deliver(cached, on_token)
+        with self._slot(model):
+            output = self._call(prompt, model, task_type, task_id, on_token, on_meta)
+        if self.cache_mode in ("write", "readwrite"):
+            self.cache.put(key, output)
+        return output
+
+    def _slot(self, model: str) -> Any:
+        if self.limiter is None:
+            return nullcontext()
+        # An adapter with a before_request hook is charged per HTTP request.
+        per_request = hasattr(self.adapter, "before_request")
+        return self.limiter.slot(model, charge=not per_request)
+
+    def sampling_params(self) -> dict[str, Any]:
+        if self.adapter is not None and hasattr(self.adapter, "sampling_params"):
+            return self.adapter.sampling_params()
+        params: dict[str, Any] = {"cmd": self.cmd_template}
+        for name in SAMPLING_ENV_VARS:
+            params[name] = os.environ.get(name)
+        return params
+
+    def _call(
+        self,
+        prompt: str,
+        model: str,
+        task_type: str,
+        task_id: str,
+        on_token: Callable[[str], None] | None = None,
+        on_meta: Callable[[dict[str, Any]], None] | None = None,
+    ) -> str:
+        if self.adapter is not None:
+            callbacks = {"on_token": on_token, "on_meta": on_meta}
+            kwargs = {k: v for k, v in callbacks.items() if v is not None}
+            try:
+                return self.adapter.generate(prompt, model, **kwargs)
+            except StreamAborted:
+                raise
+            except Exception as exc:
+                raise RuntimeError(f"Model adapter failed: {exc}") from exc
         cmd = self.cmd_template.format(
             model=model,
             task_type=task_type,
             task_id=task_id,
         )
         args = shlex.split(cmd)
-        result = subprocess.run(
-            args,
-            input=prompt,
-            text=True,
-            capture_output=True,
-            check=False,
-        )
+        with _meta_channel(on_meta) as (env, pass_fds):
+            if on_token is not None:
+                return _stream_command(args, prompt, on_token, env, pass_fds)
+            result = subprocess.run(
+                args,
+                input=prompt,
+                text=True,
+                capture_output=True,
+                check=False,
+                env={**os.environ, **env} if env else None,
+                pass_fds=pass_fds,
+            )
         if result.returncode != 0:
             stderr = result.stderr.strip()
             raise RuntimeError(
@@ -99,7 +206,132 @@ class ModelClient:
         return "Verdict: true.\nProof sketch: ..."
 
 
-def default_model_client(mock: bool = False) -> ModelClient:
+def _deliver(text: str, on_token: Callable[[str], None] | None) -> str:
+    if on_token is not None and text:
+        on_token(text)
+    return text
+
+
+@contextmanager
+def _meta_channel(
+    on_meta: Callable[[dict[str, Any]], None] | None,
+) -> Iterator[tuple[dict[str, str], tuple[int, ...]]]:
+    """Structured side channel for a model command: (extra env, fds to pass).
+
+    The command finds a writable fd in ``LOCAL_EVAL_META_FD`` and may write
+    JSON objects to it, one per line; once the command is done they are
+    merged and handed to ``on_meta``. Stdout stays plain completion text, so
+    commands that ignore the variable work unchanged.
+    """
+    if on_meta is None or os.name != "posix":
+        yield {}, ()
+        return
+    read_fd, write_fd = os.pipe()
+    received: list[bytes] = []
+
+    def drain() -> None:
+        with os.fdopen(read_fd, "rb") as f:
+            received.append(f.read())
+
+    reader = threading.Thread(target=drain, daemon=True)
+    reader.start()
+    try:
+        yield {META_FD_ENV: str(write_fd)}, (write_fd,)
+    finally:
+        # The command has exited; with our copy closed the reader sees EOF.
+        os.close(write_fd)
+        reader.join(timeout=5.0)
+        meta: dict[str, Any] = {}
+        for line in b"".join(received).decode("utf-8", errors="replace").splitlines():
+            try:
+                obj = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(obj, dict):
+                meta.update(obj)
+        if meta:
+            on_meta(meta)
+
+
+def _stream_command(
+    args: list[str],
+    prompt: str,
+    on_token: Callable[[str], None],
+    env: dict[str, str] | None = None,
+    pass_fds: tuple[int, ...] = (),
+) -> str:
+    """Run a model command, passing its stdout to ``on_token`` as it is written.
+
+    ``OPENAI_STREAM=1`` asks scripts/openai_cli.py to stream; other commands
+    simply have their output read incrementally. If ``on_token`` raises, the
+    command is killed.
+    """
+    proc = subprocess.Popen(
+        args,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env={**os.environ, **(env or {}), "OPENAI_STREAM": "1"},
+        pass_fds=pass_fds,
+    )
+    assert proc.stdin and proc.stdout and proc.stderr
+    stderr: list[bytes] = []
+
+    def feed() -> None:
+        try:
+            proc.stdin.write(prompt.encode("utf-8"))
+            proc.stdin.close()
+        except OSError:
+            pass
+
+    threads = [
+        threading.Thread(target=feed, daemon=True),
+        threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    chunks: list[str] = []
+    try:
+        while True:
+            data = os.read(proc.stdout.fileno(), 65536)
+            text = decoder.decode(data, final=not data)
+            if text:
+                chunks.append(text)
+                on_token(text)
+            if not data:
+                break
+    except BaseException:
+        proc.kill()
+        raise
+    finally:
+        returncode = proc.wait()
+        for thread in threads:
+            thread.join()
+        proc.stdout.close()
+    if returncode != 0:
+        message = b"".join(stderr).decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"Model command failed (code {returncode}): {message}")
+    return "".join(chunks)
+
+
+def _native_adapter(name: str) -> Any:
+    if name == "openai":
+        from harness.openai_adapter import OpenAIAdapter
+
+        return OpenAIAdapter.from_env()
+    raise ValueError(f"Unknown model adapter: {name}")
+
+
+def default_model_client(
+    mock: bool = False,
+    adapter: str | None = None,
+) -> ModelClient:
+    adapter = adapter or os.environ.get("LOCAL_EVAL_MODEL_ADAPTER", "cmd")
+    if adapter != "cmd":
+        if mock:
+            return ModelClient(cmd_template=None, mock=True)
+        return ModelClient(cmd_template=None, adapter=_native_adapter(adapter))
     cmd_template = os.environ.get("LOCAL_EVAL_MODEL_CMD")
     if not cmd_template:
         return ModelClient(cmd_template=None, mock=True)
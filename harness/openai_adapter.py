@@ -0,0 +1,1010 @@
+from __future__ import annotations
+
+import email.utils
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections.abc import Callable, Iterator
+from contextlib import AbstractContextManager, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from harness.cache import CapabilityCache
+
+DEFAULT_CAPABILITY_DIR = str(
+    Path(__file__).resolve().parents[1] / ".cache" / "capabilities"
+)
+
+# Statuses worth retrying: timeouts, conflicts, throttling and server errors.
+# Status 0 marks a transport failure (refused, reset, timed out).
+RETRY_STATUSES = frozenset({0, 408, 409, 429, 500, 502, 503, 504})
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class APIError(Exception):
+    def __init__(
+        self,
+        status: int,
+        message: str,
+        endpoint: str = "",
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.endpoint = endpoint
+        self.headers = headers or {}
+
+    def retry_after(self) -> float | None:
+        """Seconds the server asked us to wait (Retry-After or rate-limit headers)."""
+        return _retry_after(self.headers)
+
+
+def _parse_duration(value: str) -> float | None:
+    """Parse rate-limit reset values such as ``20ms``, ``1.5s`` or ``6m0s``."""
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in parts)
+
+
+def _retry_after(headers: dict[str, str]) -> float | None:
+    hints: list[float] = []
+    if "retry-after-ms" in headers:
+        seconds = _parse_duration(headers["retry-after-ms"])
+        if seconds is not None:
+            hints.append(seconds / 1000)
+    if "retry-after" in headers:
+        value = headers["retry-after"]
+        seconds = _parse_duration(value)
+        if seconds is None:
+            try:
+                when = email.utils.parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                when = None
+            if when is not None:
+                seconds = when.timestamp() - time.time()
+        if seconds is not None:
+            hints.append(seconds)
+    for kind in ("requests", "tokens"):
+        if headers.get(f"x-ratelimit-remaining-{kind}", "").strip() == "0":
+            reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}", ""))
+            if reset is not None:
+                hints.append(reset)
+    if not hints:
+        return None
+    return max(0.0, max(hints))
+
+
+def _backoff_delay(
+    retry: int, base: float, cap: float, retry_after: float | None = None
+) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's hint."""
+    delay = random.uniform(0, min(cap, base * (2**retry)))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def _maybe_set_temperature(payload: dict[str, object], temperature: float) -> None:
+    if temperature and temperature > 0:
+        payload["temperature"] = temperature
+
+
+def _normalize_reasoning_effort(value: str) -> str | None:
+    if not value:
+        return None
+    effort = value.strip().lower()
+    if not effort:
+        return None
+    if effort in {"xhigh", "x-high", "extra-high", "max", "maximum"}:
+        return "xhigh"
+    if effort in {"low", "medium", "high"}:
+        return effort
+    return effort
+
+
+def _maybe_set_reasoning(payload: dict[str, object], effort: str | None) -> None:
+    if effort:
+        payload["reasoning"] = {"effort": effort}
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections, reused per (scheme, host, port).
+
+    Up to ``size`` idle connections are kept per origin; extra connections
+    opened under concurrency are closed once their response has been read.
+    """
+
+    def __init__(self, size: int = 8) -> None:
+        self.size = max(1, size)
+        self._lock = threading.Lock()
+        self._idle: dict[tuple[str, str, int], list[http.client.HTTPConnection]] = {}
+
+    def _connect(
+        self, scheme: str, host: str, port: int, timeout: float
+    ) -> http.client.HTTPConnection:
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=timeout)
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _checkout(
+        self, key: tuple[str, str, int], timeout: float
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                conn = idle.pop()
+                conn.timeout = timeout
+                if conn.sock is not None:
+                    conn.sock.settimeout(timeout)
+                return conn, True
+        return self._connect(*key, timeout), False
+
+    def _checkin(
+        self, key: tuple[str, str, int], conn: http.client.HTTPConnection
+    ) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(
+        self,
+        url: str,
+        body: bytes,
+        headers: dict[str, str],
+        timeout: float,
+    ) -> tuple[tuple[str, str, int], http.client.HTTPConnection, Any]:
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        key = (scheme, parts.hostname or "", port)
+        path = parts.path or "/"
+        if parts.query:
+            path = f"{path}?{parts.query}"
+
+        conn, reused = self._checkout(key, timeout)
+        while True:
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                return key, conn, conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError) as err:
+                conn.close()
+                if not reused:
+                    raise APIError(0, str(err)) from err
+                # The server dropped an idle keep-alive connection; retry once
+                # on a fresh one.
+                conn, reused = self._connect(*key, timeout), False
+            except (OSError, http.client.HTTPException) as err:
+                conn.close()
+                raise APIError(0, str(err)) from err
+
+    @contextmanager
+    def open(
+        self,
+        url: str,
+        body: bytes,
+        headers: dict[str, str],
+        timeout: float,
+    ) -> Iterator[Any]:
+        """POST and yield the response unread, e.g. to consume a stream.
+
+        The connection goes back to the pool only if the body was read to the
+        end; a caller that bails out early gets it closed instead.
+        """
+        key, conn, resp = self._send(url, body, headers, timeout)
+        try:
+            yield resp
+        except BaseException:
+            conn.close()
+            raise
+        if resp.will_close or not resp.isclosed():
+            conn.close()
+        else:
+            self._checkin(key, conn)
+
+    def request(
+        self,
+        url: str,
+        body: bytes,
+        headers: dict[str, str],
+        timeout: float,
+    ) -> tuple[int, str, dict[str, str], bytes]:
+        with self.open(url, body, headers, timeout) as resp:
+            try:
+                data = resp.read()
+            except (OSError, http.client.HTTPException) as err:
+                raise APIError(0, str(err)) from err
+        return resp.status, resp.reason, _lower_headers(resp), data
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+_shared_pool: ConnectionPool | None = None
+_shared_pool_lock = threading.Lock()
+
+
+def shared_pool() -> ConnectionPool:
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = ConnectionPool(int(os.getenv("OPENAI_POOL_SIZE", "8")))
+        return _shared_pool
+
+
+def _uses_proxy(url: str) -> bool:
+    parts = urllib.parse.urlsplit(url)
+    proxies = urllib.request.getproxies()
+    if parts.scheme not in proxies:
+        return False
+    return not urllib.request.proxy_bypass(parts.hostname or "")
+
+
+def _lower_headers(resp: Any) -> dict[str, str]:
+    return {k.lower(): v for k, v in (resp.headers or {}).items()}
+
+
+@contextmanager
+def _urllib_open(
+    url: str, data: bytes, headers: dict[str, str], timeout: float
+) -> Iterator[Any]:
+    req = urllib.request.Request(
+        url,
+        data=data,
+        method="POST",
+        headers=headers,
+    )
+    try:
+        resp = urllib.request.urlopen(req, timeout=timeout)
+    except urllib.error.HTTPError as err:
+        if not err.fp:
+            raise APIError(
+                err.code, str(err.reason), headers=_lower_headers(err)
+            ) from err
+        resp = err
+    except urllib.error.URLError as err:
+        raise APIError(0, str(err)) from err
+    with resp:
+        yield resp
+
+
+def _urllib_request(
+    url: str, data: bytes, headers: dict[str, str], timeout: float
+) -> tuple[int, str, dict[str, str], bytes]:
+    with _urllib_open(url, data, headers, timeout) as resp:
+        return resp.status, str(resp.reason), _lower_headers(resp), resp.read()
+
+
+def _open(
+    url: str,
+    data: bytes,
+    headers: dict[str, str],
+    timeout: float,
+    pool: ConnectionPool | None,
+) -> AbstractContextManager[Any]:
+    if _uses_proxy(url):
+        # http.client does not speak to proxies; keep urllib's handling there.
+        return _urllib_open(url, data, headers, timeout)
+    return (pool or shared_pool()).open(url, data, headers, timeout)
+
+
+def _request_json(
+    url: str,
+    payload: dict[str, object],
+    api_key: str,
+    timeout: float,
+    extra_headers: dict[str, str] | None = None,
+    pool: ConnectionPool | None = None,
+) -> dict[str, object]:
+    data = json.dumps(payload).encode("utf-8")
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+    if _uses_proxy(url):
+        # http.client does not speak to proxies; keep urllib's handling there.
+        status, reason, resp_headers, raw = _urllib_request(url, data, headers, timeout)
+    else:
+        pool = pool or shared_pool()
+        status, reason, resp_headers, raw = pool.request(url, data, headers, timeout)
+    body = raw.decode("utf-8")
+    if status >= 400:
+        raise APIError(status, body or reason, headers=resp_headers)
+    if os.getenv("OPENAI_DEBUG") == "1":
+        print(body, file=sys.stderr)
+    return json.loads(body)
+
+
+def _sse_events(resp: Any) -> Iterator[dict[str, object]]:
+    """JSON payloads of a server-sent event stream, up to ``[DONE]``."""
+    data: list[str] = []
+    # A trailing blank line ends the last event even if the server omitted it.
+    for raw in itertools.chain(resp, [b""]):
+        line = raw.decode("utf-8").rstrip("\r\n")
+        if line.startswith("data:"):
+            data.append(line[5:].removeprefix(" "))
+            continue
+        if line or not data:
+            continue
+        payload, data = "\n".join(data), []
+        if payload == "[DONE]":
+            return
+        try:
+            event = json.loads(payload)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(event, dict):
+            yield event
+
+
+# Error codes and types sent in a stream that are worth retrying; any other
+# error event is taken to be about the request itself.
+_STREAM_ERROR_STATUSES = {
+    "rate_limit_exceeded": 429,
+    "rate_limit_error": 429,
+    "timeout": 408,
+    "server_error": 500,
+    "api_error": 500,
+    "overloaded_error": 503,
+    "server_is_overloaded": 503,
+}
+
+
+def _stream_error(event: dict[str, Any]) -> dict[str, Any]:
+    """The error object of a streamed ``error`` or ``response.failed`` event."""
+    response = event.get("response")
+    for error in (
+        event.get("error"),
+        response.get("error") if isinstance(response, dict) else None,
+    ):
+        if isinstance(error, dict):
+            return error
+    return {k: v for k, v in event.items() if k != "type"}
+
+
+def _stream_error_status(error: dict[str, Any]) -> int:
+    """Map a streamed error to the HTTP status it stands for."""
+    code = error.get("code")
+    if isinstance(code, int) and 400 <= code < 600:
+        return code
+    for name in (code, error.get("type")):
+        if isinstance(name, str) and name in _STREAM_ERROR_STATUSES:
+            return _STREAM_ERROR_STATUSES[name]
+    return 400
+
+
+def _request_stream(
+    url: str,
+    payload: dict[str, object],
+    api_key: str,
+    timeout: float,
+    on_text: Callable[[str], None],
+    extra_headers: dict[str, str] | None = None,
+    pool: ConnectionPool | None = None,
+) -> dict[str, object]:
+    """POST with ``stream: true``, passing text deltas to ``on_text`` as they arrive.
+
+    Returns a response shaped like the non-streamed one (the final
+    ``response.completed`` object for /responses, a single chat choice for
+    /chat/completions), so the usual extractors apply.
+    """
+    data = json.dumps(payload).encode("utf-8")
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json",
+        "Accept": "text/event-stream",
+    }
+    if extra_headers:
+        headers.update(extra_headers)
+    texts: list[str] = []
+    final: dict[str, object] | None = None
+    chat: dict[str, object] | None = None
+    with _open(url, data, headers, timeout, pool) as resp:
+        if resp.status >= 400:
+            body = resp.read().decode("utf-8")
+            raise APIError(
+                resp.status, body or str(resp.reason), headers=_lower_headers(resp)
+            )
+        try:
+            for event in _sse_events(resp):
+                if os.getenv("OPENAI_DEBUG") == "1":
+                    print(json.dumps(event), file=sys.stderr)
+                text = None
+                choices = event.get("choices")
+                if isinstance(choices, list):
+                    chat = chat or {}
+                    chat.update((k, v) for k, v in event.items() if k != "choices")
+                    delta = choices[0].get("delta") if choices else None
+                    if isinstance(delta, dict):
+                        text = delta.get("content")
+                elif event.get("type") == "response.output_text.delta":
+                    text = event.get("delta")
+                elif event.get("type") == "response.completed":
+                    response = event.get("response")
+                    final = response if isinstance(response, dict) else None
+                elif event.get("type") in ("error", "response.failed") or (
+                    isinstance(event.get("error"), dict)
+                ):
+                    error = _stream_error(event)
+                    raise APIError(
+                        _stream_error_status(error), json.dumps({"error": error})
+                    )
+                if isinstance(text, str) and text:
+                    texts.append(text)
+                    on_text(text)
+            resp.read()
+        except (OSError, http.client.HTTPException) as err:
+            raise APIError(0, str(err)) from err
+    if final is not None:
+        return final
+    if chat is not None:
+        message = {"role": "assistant", "content": "".join(texts)}
+        return {**chat, "choices": [{"index": 0, "message": message}]}
+    return {"output_text": "".join(texts)}
+
+
+def _extract_text_from_responses(resp: dict[str, object]) -> str:
+    output_text = resp.get("output_text")
+    if isinstance(output_text, str) and output_text.strip():
+        return output_text
+
+    texts: list[str] = []
+    output = resp.get("output")
+    if isinstance(output, list):
+        for item in output:
+            if not isinstance(item, dict):
+                continue
+            item_type = item.get("type")
+            if item_type in {"output_text", "text"}:
+                text = item.get("text")
+                if isinstance(text, str):
+                    texts.append(text)
+                continue
+            if item_type != "message":
+                continue
+            content = item.get("content")
+            if isinstance(content, str):
+                texts.append(content)
+                continue
+            if not isinstance(content, list):
+                continue
+            for chunk in content:
+                if not isinstance(chunk, dict):
+                    continue
+                chunk_type = chunk.get("type")
+                if chunk_type in {"output_text", "text"}:
+                    text = chunk.get("text")
+                    if isinstance(text, str):
+                        texts.append(text)
+    if texts:
+        return "".join(texts)
+
+    return ""
+
+
+def _extract_text_from_chat(resp: dict[str, object]) -> str:
+    choices = resp.get("choices")
+    if not isinstance(choices, list) or not choices:
+        raise APIError(0, "No choices in chat response")
+    first = choices[0]
+    if not isinstance(first, dict):
+        raise APIError(0, "Invalid chat choice payload")
+    message = first.get("message")
+    if not isinstance(message, dict):
+        raise APIError(0, "Invalid chat message payload")
+    content = message.get("content")
+    if not isinstance(content, str):
+        return ""
+    return content
+
+
+def _extract_text_from_completions(resp: dict[str, object]) -> str:
+    choices = resp.get("choices")
+    if not isinstance(choices, list) or not choices:
+        raise APIError(0, "No choices in completions response")
+    first = choices[0]
+    if not isinstance(first, dict):
+        raise APIError(0, "Invalid completions choice payload")
+    text = first.get("text")
+    if not isinstance(text, str):
+        return ""
+    return text
+
+
+def _count(value: object) -> int:
+    return value if isinstance(value, int) and not isinstance(value, bool) else 0
+
+
+def normalize_usage(raw: object) -> dict[str, int] | None:
+    """Token usage from a responses or chat payload, under one set of names.
+
+    Returns prompt, completion, reasoning, cached and total token counts;
+    reasoning tokens are part of completion tokens and cached tokens part of
+    prompt tokens, as both APIs bill them.
+    """
+    if not isinstance(raw, dict):
+        return None
+    prompt = _count(raw.get("input_tokens", raw.get("prompt_tokens")))
+    completion = _count(raw.get("output_tokens", raw.get("completion_tokens")))
+    output_details = raw.get("output_tokens_details") or raw.get(
+        "completion_tokens_details"
+    )
+    input_details = raw.get("input_tokens_details") or raw.get("prompt_tokens_details")
+    reasoning = cached = 0
+    if isinstance(output_details, dict):
+        reasoning = _count(output_details.get("reasoning_tokens"))
+    if isinstance(input_details, dict):
+        cached = _count(input_details.get("cached_tokens"))
+    total = _count(raw.get("total_tokens")) or prompt + completion
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "reasoning_tokens": reasoning,
+        "cached_tokens": cached,
+        "total_tokens": total,
+    }
+
+
+_EXTRACTORS: dict[str, Callable[[dict[str, object]], str]] = {
+    "/responses": _extract_text_from_responses,
+    "/chat/completions": _extract_text_from_chat,
+    "/completions": _extract_text_from_completions,
+}
+
+
+_ENDPOINT_NAMES = {
+    "/responses": "responses",
+    "/chat/completions": "chat",
+    "/completions": "completions",
+}
+
+
+def _new_trace() -> dict[str, Any]:
+    return {"endpoint": None, "requests": [], "retries": 0, "backoff_sec": 0.0}
+
+
+def _parse_error_message(raw: str) -> str:
+    try:
+        data = json.loads(raw)
+    except json.JSONDecodeError:
+        return raw
+    if isinstance(data, dict) and "error" in data:
+        err = data["error"]
+        if isinstance(err, dict):
+            message = err.get("message")
+            if isinstance(message, str):
+                return message
+    return raw
+
+
+def _endpoint_error(endpoint: str, err: APIError) -> APIError:
+    return APIError(
+        err.status,
+        _parse_error_message(err.message),
+        endpoint=endpoint,
+        headers=err.headers,
+    )
+
+
+def _capabilities_stale(err: APIError, known: dict[str, Any]) -> bool:
+    """Whether ``err`` says a cached endpoint or parameter no longer works.
+
+    A 400 about the request itself (context length, content policy) does not
+    count; only one that names the cached endpoint or reasoning parameter.
+    """
+    if err.status in (404, 405):
+        return True
+    if err.status != 400:
+        return False
+    terms = [known["endpoint"]] if known.get("endpoint") else []
+    if known.get("efforts"):
+        terms += ["reasoning", "effort"]
+    lowered = _parse_error_message(err.message).lower()
+    return any(term in lowered for term in terms)
+
+
+@dataclass
+class OpenAIAdapter:
+    """In-process client for OpenAI-compatible APIs.
+
+    One instance is meant to live for a whole run so per-call cost is just the
+    HTTP round trip, not interpreter startup and configuration parsing.
+    """
+
+    api_key: str
+    api_base: str = "https://api.openai.com/v1"
+    temperature: float = 0.0
+    max_output_tokens: int = 1024
+    timeout: float = 60.0
+    force_chat: bool = False
+    force_endpoint: str = ""
+    reasoning_effort: str | None = None
+    extra_headers: dict[str, str] = field(default_factory=dict)
+    pool: ConnectionPool = field(default_factory=shared_pool, repr=False)
+    max_retries: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    sleep: Callable[[float], None] = field(default=time.sleep, repr=False)
+    capabilities: CapabilityCache | None = field(default=None, repr=False)
+    # Called with the model name before every HTTP request, e.g. to wait for
+    # a rate limit token.
+    before_request: Callable[[str], None] | None = field(default=None, repr=False)
+
+    @classmethod
+    def from_env(
+        cls,
+        api_base: str | None = None,
+        temperature: float | None = None,
+        max_output_tokens: int | None = None,
+    ) -> OpenAIAdapter:
+        openrouter_key = os.getenv("OPENROUTER_API_KEY")
+        api_key = openrouter_key or os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENROUTER_API_KEY or OPENAI_API_KEY is not set")
+
+        if api_base is None:
+            api_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
+        if temperature is None:
+            temperature = float(os.getenv("OPENAI_TEMPERATURE", "0"))
+        if max_output_tokens is None:
+            max_output_tokens = int(os.getenv("OPENAI_MAX_OUTPUT_TOKENS", "1024"))
+
+        timeout = float(os.getenv("OPENAI_TIMEOUT", "60"))
+        max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+        backoff_base = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+        backoff_max = float(os.getenv("OPENAI_BACKOFF_MAX", "30"))
+        force_chat = os.getenv("OPENAI_FORCE_CHAT", "0") == "1"
+        force_endpoint = os.getenv("OPENAI_FORCE_ENDPOINT", "").lower()
+        openrouter_force_endpoint = os.getenv("OPENROUTER_FORCE_ENDPOINT", "").lower()
+
+        if openrouter_key:
+            api_base = os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
+        elif os.getenv("OPENROUTER_API_BASE"):
+            api_base = os.getenv("OPENROUTER_API_BASE", api_base)
+
+        is_openrouter = "openrouter.ai" in api_base or openrouter_key is not None
+        if is_openrouter:
+            force_endpoint = openrouter_force_endpoint or "chat"
+
+        extra_headers: dict[str, str] = {}
+        if is_openrouter:
+            referer = (
+                os.getenv("OPENROUTER_HTTP_REFERER")
+                or os.getenv("OPENROUTER_SITE")
+                or os.getenv("OPENROUTER_REFERER")
+            )
+            title = os.getenv("OPENROUTER_X_TITLE") or os.getenv("OPENROUTER_TITLE")
+            if referer:
+                extra_headers["HTTP-Referer"] = referer
+            if title:
+                extra_headers["X-Title"] = title
+        reasoning_effort = _normalize_reasoning_effort(
+            os.getenv("OPENAI_REASONING_EFFORT", "")
+        )
+
+        if force_endpoint == "responses":
+            force_chat = False
+
+        capabilities = None
+        capability_dir = os.getenv("OPENAI_CAPABILITY_CACHE", DEFAULT_CAPABILITY_DIR)
+        if capability_dir.lower() not in ("", "off", "0"):
+            capabilities = CapabilityCache(Path(capability_dir))
+
+        return cls(
+            api_key=api_key,
+            api_base=api_base,
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            timeout=timeout,
+            force_chat=force_chat,
+            force_endpoint=force_endpoint,
+            reasoning_effort=reasoning_effort,
+            extra_headers=extra_headers,
+            max_retries=max_retries,
+            backoff_base=backoff_base,
+            backoff_max=backoff_max,
+            capabilities=capabilities,
+        )
+
+    def sampling_params(self) -> dict[str, object]:
+        return {
+            "api_base": self.api_base,
+            "temperature": self.temperature,
+            "max_output_tokens": self.max_output_tokens,
+            "reasoning_effort": self.reasoning_effort,
+            "force_chat": self.force_chat,
+            "force_endpoint": self.force_endpoint,
+        }
+
+    def _post(
+        self,
+        path: str,
+        payload: dict[str, object],
+        on_text: Callable[[str], None] | None = None,
+        trace: dict[str, Any] | None = None,
+    ) -> dict[str, object]:
+        """POST with retries on throttling, server errors and dropped connections.
+
+        With ``on_text`` the request is streamed; it is not retried once text
+        has been handed out, since the caller cannot take it back. ``trace``
+        collects each HTTP request, the retry count and time spent backing off.
+        """
+        trace = trace if trace is not None else _new_trace()
+        emitted = False
+
+        def forward(text: str) -> None:
+            nonlocal emitted
+            emitted = True
+            assert on_text is not None
+            on_text(text)
+
+        retry = 0
+        while True:
+            request = {"endpoint": _ENDPOINT_NAMES[path], "status": 200}
+            trace["requests"].append(request)
+            if self.before_request is not None:
+                self.before_request(str(payload.get("model", "")))
+            started = time.monotonic()
+            try:
+                if on_text is not None:
+                    return _request_stream(
+                        f"{self.api_base}{path}",
+                        {**payload, "stream": True},
+                        self.api_key,
+                        self.timeout,
+                        forward,
+                        extra_headers=self.extra_headers,
+                        pool=self.pool,
+                    )
+                return _request_json(
+                    f"{self.api_base}{path}",
+                    payload,
+                    self.api_key,
+                    self.timeout,
+                    extra_headers=self.extra_headers,
+                    pool=self.pool,
+                )
+            except APIError as err:
+                request["status"] = err.status
+                if (
+                    emitted
+                    or retry >= self.max_retries
+                    or err.status not in RETRY_STATUSES
+                ):
+                    raise
+                delay = _backoff_delay(
+                    retry, self.backoff_base, self.backoff_max, err.retry_after()
+                )
+                retry += 1
+                trace["retries"] += 1
+                trace["backoff_sec"] += delay
+                if os.getenv("OPENAI_DEBUG") == "1":
+                    print(
+                        f"retry {retry}/{self.max_retries} for {path} "
+                        f"after {err.status}, sleeping {delay:.2f}s",
+                        file=sys.stderr,
+                    )
+            finally:
+                request["sec"] = time.monotonic() - started
+            self.sleep(delay)
+
+    def _text(
+        self,
+        path: str,
+        payload: dict[str, object],
+        on_token: Callable[[str], None] | None,
+        trace: dict[str, Any],
+    ) -> str:
+        if on_token is None or path == "/completions":
+            # Legacy completions are not streamed; their text arrives at once.
+            resp = self._post(path, payload, trace=trace)
+        else:
+            if path == "/chat/completions":
+                # Chat streams only carry usage in a final chunk when asked.
+                payload = {**payload, "stream_options": {"include_usage": True}}
+            resp = self._post(path, payload, on_text=on_token, trace=trace)
+        text = _EXTRACTORS[path](resp)
+        if on_token is not None and path == "/completions" and text:
+            on_token(text)
+        trace["endpoint"] = _ENDPOINT_NAMES[path]
+        usage = normalize_usage(resp.get("usage"))
+        if usage is not None:
+            trace["usage"] = usage
+        return text
+
+    def generate(
+        self,
+        prompt: str,
+        model: str,
+        on_token: Callable[[str], None] | None = None,
+        on_meta: Callable[[dict[str, Any]], None] | None = None,
+    ) -> str:
+        """Return the completion text, falling back responses -> chat -> completions.
+
+        With ``on_token`` the responses and chat endpoints are streamed and
+        each text delta is passed to it as it arrives. ``on_meta`` receives a
+        trace of the call once it is over, failed or not: the ``endpoint``
+        that answered, every HTTP request (endpoint, status, seconds),
+        ``retries``, ``backoff_sec``, ``ttft_sec`` when streamed, ``total_sec``
+        and provider ``usage`` (see :func:`normalize_usage`). Raises APIError
+        with ``endpoint`` set to the endpoint that failed last.
+
+        With ``capabilities`` set, what earlier calls learned about this
+        (api_base, model) is reused: the call starts at the endpoint that
+        worked and sends parameters the server accepted. A stale record is
+        dropped and the call repeated with full discovery.
+        """
+        trace = _new_trace()
+        started = time.monotonic()
+
+        def first_token(text: str) -> None:
+            if "ttft_sec" not in trace:
+                trace["ttft_sec"] = time.monotonic() - started
+            assert on_token is not None
+            on_token(text)
+
+        stream = first_token if on_token else None
+        known = self._load_capabilities(model)
+        caps = dict(known)
+        trace["capabilities_cached"] = bool(known)
+        try:
+            try:
+                text = self._generate(prompt, model, stream, trace, caps)
+            except APIError as err:
+                stale = _capabilities_stale(err, known) and "ttft_sec" not in trace
+                if not known or not stale:
+                    raise
+                self._save_capabilities(model, {})
+                known, caps = {}, {}
+                text = self._generate(prompt, model, stream, trace, caps)
+            caps["endpoint"] = trace["endpoint"]
+            if caps != known:
+                self._save_capabilities(model, caps)
+            return text
+        finally:
+            trace["total_sec"] = time.monotonic() - started
+            if on_meta is not None:
+                on_meta(trace)
+
+    def _load_capabilities(self, model: str) -> dict[str, Any]:
+        if self.capabilities is None:
+            return {}
+        value = self.capabilities.get(self.capabilities.key(self.api_base, model))
+        return value if isinstance(value, dict) else {}
+
+    def _save_capabilities(self, model: str, caps: dict[str, Any]) -> None:
+        if self.capabilities is None:
+            return
+        try:
+            self.capabilities.put(self.capabilities.key(self.api_base, model), caps)
+        except OSError:
+            # A read-only or full cache only costs the skipped fallbacks.
+            pass
+
+    def _generate(
+        self,
+        prompt: str,
+        model: str,
+        on_token: Callable[[str], None] | None,
+        trace: dict[str, Any],
+        caps: dict[str, Any],
+    ) -> str:
+        """One pass through the endpoint fallbacks; records findings in ``caps``."""
+        force_endpoint = self.force_endpoint
+        efforts = caps.get("efforts") or {}
+        reasoning_effort = efforts.get(self.reasoning_effort, self.reasoning_effort)
+        # An explicit force_endpoint wins over what was learned.
+        start = None if force_endpoint or self.force_chat else caps.get("endpoint")
+
+        def call(path: str, payload: dict[str, object]) -> str:
+            return self._text(path, payload, on_token, trace)
+
+        if (
+            not self.force_chat
+            and force_endpoint != "chat"
+            and start in (None, "responses")
+        ):
+            responses_payload: dict[str, object] = {
+                "model": model,
+                "input": prompt,
+            }
+            _maybe_set_temperature(responses_payload, self.temperature)
+            _maybe_set_reasoning(responses_payload, reasoning_effort)
+            if self.max_output_tokens > 0:
+                responses_payload["max_output_tokens"] = self.max_output_tokens
+            try:
+                return call("/responses", responses_payload)
+            except APIError as err:
+                message = _parse_error_message(err.message)
+                lowered = message.lower()
+                effort_rejected = (
+                    "unsupported value" in lowered or "supported values" in lowered
+                )
+                if (
+                    reasoning_effort == "xhigh"
+                    and effort_rejected
+                    and "xhigh" in lowered
+                ):
+                    responses_payload["reasoning"] = {"effort": "high"}
+                    caps["efforts"] = {**efforts, "xhigh": "high"}
+                    try:
+                        return call("/responses", responses_payload)
+                    except APIError as retry_err:
+                        raise _endpoint_error("responses", retry_err) from retry_err
+                if err.status not in (400, 404, 405):
+                    raise _endpoint_error("responses", err) from err
+                if "not supported" in lowered and force_endpoint == "responses":
+                    raise _endpoint_error("responses", err) from err
+
+        chat_payload: dict[str, object] | None = None
+        if force_endpoint != "completions" and start != "completions":
+            chat_payload = {
+                "model": model,
+                "messages": [{"role": "user", "content": prompt}],
+            }
+            _maybe_set_temperature(chat_payload, self.temperature)
+            if caps.get("reasoning") is not False:
+                _maybe_set_reasoning(chat_payload, reasoning_effort)
+
+        if chat_payload is not None:
+            if self.max_output_tokens > 0:
+                chat_payload["max_tokens"] = self.max_output_tokens
+            try:
+                return call("/chat/completions", chat_payload)
+            except APIError as err:
+                message = _parse_error_message(err.message)
+                lowered = message.lower()
+                if "unsupported value" in lowered and "xhigh" in lowered:
+                    chat_payload["reasoning"] = {"effort": "high"}
+                    caps["efforts"] = {**efforts, "xhigh": "high"}
+                    try:
+                        return call("/chat/completions", chat_payload)
+                    except APIError as retry_err:
+                        raise _endpoint_error("chat", retry_err) from retry_err
+                if "unsupported parameter" in lowered and "reasoning" in lowered:
+                    chat_payload.pop("reasoning", None)
+                    caps["reasoning"] = False
+                    try:
+                        return call("/chat/completions", chat_payload)
+                    except APIError as retry_err:
+                        raise _endpoint_error("chat", retry_err) from retry_err
+                if "not a chat model" not in lowered or force_endpoint == "chat":
+                    raise _endpoint_error("chat", err) from err
+
+        completions_payload: dict[str, object] = {
+            "model": model,
+            "prompt": prompt,
+        }
+        _maybe_set_temperature(completions_payload, self.temperature)
+        if self.max_output_tokens > 0:
+            completions_payload["max_tokens"] = self.max_output_tokens
+        try:
+            return call("/completions", completions_payload)
+        except APIError as err:
+            raise _endpoint_error("completions", err) from err
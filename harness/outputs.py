@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import gzip
+import json
+import threading
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+
+OUTPUTS_FILE = "outputs.jsonl.gz"
+_GZIP_MAGIC = b"\x1f\x8b\x08"
+_READ_CHUNK = 16384
+# Generation facts kept with the output so regrading does not lose them.
+GENERATION_KEYS = (
+    "generation_sec",
+    "ttft_sec",
+    "tokens_per_sec",
+    "stream_tokens",
+    "stream_abort",
+    "usage",
+    "adapter_meta",
+)
+
+
+class OutputStore:
+    """Append-only, gzip-compressed JSONL sidecar of raw attempt outputs.
+
+    Each append is written as its own gzip member. Reading skips a member torn
+    by an interrupted write and carries on with the ones after it.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        task: Any,
+        model: str,
+        attempt_result: dict[str, Any],
+        output: str,
+    ) -> None:
+        entry = {
+            "model": model,
+            "task_type": task.task_type,
+            "task_id": task.task_id,
+            "attempt": attempt_result["attempt"],
+            "output": output,
+            "model_error": attempt_result.get("model_error"),
+            "elapsed_sec": attempt_result.get("elapsed_sec"),
+            **{k: attempt_result[k] for k in GENERATION_KEYS if k in attempt_result},
+        }
+        blob = gzip.compress((json.dumps(entry) + "\n").encode("utf-8"))
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("ab") as f:
+                f.write(blob)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        if not self.path.exists():
+            return
+        raw = self.path.read_bytes()
+        data = memoryview(raw)
+        pos = 0
+        while pos < len(data):
+            # Feed each member in bounded chunks so that neither the input nor
+            # ``unused_data`` copies the rest of the file per record.
+            decoder = zlib.decompressobj(wbits=31)
+            parts = []
+            end = pos
+            try:
+                while not decoder.eof and end < len(data):
+                    chunk_end = min(end + _READ_CHUNK, len(data))
+                    parts.append(decoder.decompress(data[end:chunk_end]))
+                    end = chunk_end
+            except zlib.error:
+                pass
+            if not decoder.eof:
+                # A member cut short by a crash: resume at the next member
+                # header so entries appended after a resume stay readable.
+                pos = raw.find(_GZIP_MAGIC, pos + 1)
+                if pos < 0:
+                    return
+                continue
+            pos = end - len(decoder.unused_data)
+            text = b"".join(parts).decode("utf-8", errors="replace")
+            for line in text.splitlines():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
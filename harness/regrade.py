@@ -0,0 +1,211 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+if __package__ in (None, ""):
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from harness import core
+from harness.cache import CACHE_MODES, VerdictCache
+from harness.graders.arbiter import ArbiterPool, resolve_verdict
+from harness.graders.py_pool import make_py_grader
+from harness.models import arbiter_client
+from harness.outputs import GENERATION_KEYS, OUTPUTS_FILE, OutputStore
+from harness.reporting import RESULTS_LOG, ResultLog
+from harness.run_eval import _aggregate, _write_metrics, _write_summary
+
+TYPE_ORDER = ["md", "py", "synth", "lean"]
+
+
+def _load_outputs(
+    store: OutputStore,
+) -> dict[tuple[str, str, str], dict[int, dict[str, Any]]]:
+    grouped: dict[tuple[str, str, str], dict[int, dict[str, Any]]] = {}
+    for entry in store:
+        key = (entry["model"], entry["task_type"], entry["task_id"])
+        grouped.setdefault(key, {})[int(entry["attempt"])] = entry
+    return grouped
+
+
+def _result_order(
+    keys: list[tuple[str, str, str]],
+    previous: list[dict[str, Any]],
+) -> list[tuple[str, str, str]]:
+    rank = {
+        (r.get("model"), r.get("task_type"), r.get("task_id")): idx
+        for idx, r in enumerate(previous)
+        if isinstance(r, dict)
+    }
+
+    def sort_key(key: tuple[str, str, str]) -> tuple[int, int, str, str]:
+        model, task_type, task_id = key
+        type_rank = TYPE_ORDER.index(task_type) if task_type in TYPE_ORDER else 99
+        return (rank.get(key, len(rank)), type_rank, task_id, model)
+
+    return sorted(keys, key=sort_key)
+
+
+def regrade_task(
+    task: core.Task,
+    model: str,
+    entries: dict[int, dict[str, Any]],
+    max_tries: int,
+    repo_root: Path,
+    min_coverage: float = 90.0,
+    arbiter: Any | None = None,
+    py_grader: Any | None = None,
+) -> dict[str, Any]:
+    """Re-score stored outputs for one task.
+
+    Attempt end times are rebuilt from the stored per-attempt elapsed time, so
+    time-to-fix keeps its meaning for sequential runs.
+    """
+    start_time = time.time()
+    finished: list[tuple[dict[str, Any], float]] = []
+    clock = 0.0
+    for attempt in sorted(entries):
+        entry = entries[attempt]
+        output = entry.get("output") or ""
+        grade = core.grade_output(
+            task, output, repo_root, min_coverage, arbiter, py_grader
+        )
+        clock += float(entry.get("elapsed_sec") or 0.0)
+        attempt_result = {
+            "attempt": attempt,
+            "passed": grade["passed"],
+            "details": grade,
+            "output_chars": len(output),
+            "model_error": entry.get("model_error"),
+            "elapsed_sec": entry.get("elapsed_sec"),
+            **{k: entry[k] for k in GENERATION_KEYS if k in entry},
+        }
+        finished.append((attempt_result, clock))
+    for attempt_result, _ in finished:
+        attempt_result["passed"] = resolve_verdict(attempt_result["details"])["passed"]
+    return core.summarize_attempts(
+        task, model, finished, max_tries, time.time() - start_time
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="local-eval regrade")
+    parser.add_argument("--reports-dir", default="reports")
+    parser.add_argument("--out-dir", default=None)
+    parser.add_argument("--min-coverage", type=float, default=None)
+    parser.add_argument("--max-tries", type=int, default=None)
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--py-warm", action="store_true")
+    parser.add_argument("--py-workers", type=int, default=0)
+    parser.add_argument("--py-timeout", type=float, default=300.0)
+    parser.add_argument("--arbiter-workers", type=int, default=8)
+    parser.add_argument("--arbiter-always", action="store_true")
+    parser.add_argument(
+        "--verdict-cache-mode", choices=CACHE_MODES, default="readwrite"
+    )
+    parser.add_argument("--verdict-cache-dir", default=".cache/verdicts")
+    parser.add_argument("--verdict-cache-max-mb", type=float, default=64.0)
+    args = parser.parse_args(argv)
+
+    repo_root = Path(__file__).resolve().parents[1]
+    report_dir = repo_root / args.reports_dir
+    out_dir = repo_root / args.out_dir if args.out_dir else report_dir
+
+    store = OutputStore(report_dir / OUTPUTS_FILE)
+    grouped = _load_outputs(store)
+    if not grouped:
+        raise SystemExit(f"No stored outputs found in {store.path}")
+
+    previous: dict[str, Any] = {}
+    metrics_path = report_dir / "metrics.json"
+    if metrics_path.exists():
+        previous = json.loads(metrics_path.read_text(encoding="utf-8"))
+    run_meta = dict(previous.get("run") or {})
+    run_meta.setdefault("timestamp", time.strftime("%Y-%m-%d %H:%M:%S"))
+    run_meta.setdefault("logic_model", "n/a")
+    run_meta.setdefault("code_model", "n/a")
+    min_coverage = args.min_coverage
+    if min_coverage is None:
+        min_coverage = float(run_meta.get("min_coverage", 90.0))
+    run_meta["min_coverage"] = min_coverage
+    # Time-to-fix is judged against the run's attempt budget; tasks that
+    # stopped early have fewer stored outputs than that.
+    max_tries = args.max_tries or run_meta.get("max_tries")
+    if max_tries:
+        run_meta["max_tries"] = int(max_tries)
+    run_meta["regraded_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+
+    tasks = core.list_tasks(repo_root / "tasks")
+    by_key = {(t.task_type, t.task_id): t for group in tasks.values() for t in group}
+    arbiter = None
+    if os.environ.get("LOCAL_EVAL_ARBITER_CMD"):
+        arbiter = ArbiterPool(
+            arbiter_client(),
+            workers=args.arbiter_workers,
+            always_run=args.arbiter_always,
+            cache=VerdictCache(
+                repo_root / args.verdict_cache_dir,
+                max_bytes=int(args.verdict_cache_max_mb * 1024 * 1024),
+            ),
+            cache_mode=args.verdict_cache_mode,
+        )
+
+    keys = _result_order(list(grouped), previous.get("results") or [])
+    missing = [k for k in keys if (k[1], k[2]) not in by_key]
+    for model, task_type, task_id in missing:
+        print(
+            f"skip {task_id} ({task_type}) model={model}: task not found",
+            flush=True,
+        )
+    keys = [k for k in keys if k not in missing]
+
+    def run_one(key: tuple[str, str, str]) -> dict[str, Any]:
+        model, task_type, task_id = key
+        entries = grouped[key]
+        return regrade_task(
+            by_key[(task_type, task_id)],
+            model,
+            entries,
+            int(max_tries) if max_tries else len(entries),
+            repo_root,
+            min_coverage=min_coverage,
+            arbiter=arbiter,
+            py_grader=py_grader,
+        )
+
+    jobs = max(1, args.jobs)
+    py_grader = make_py_grader(
+        repo_root,
+        workers=args.py_workers,
+        warm=args.py_warm,
+        timeout=args.py_timeout or None,
+        threads=jobs,
+    )
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(run_one, keys))
+    finally:
+        py_grader.close()
+        if arbiter is not None:
+            arbiter.close()
+
+    # Resume reads the results log first, so it must match the new reports.
+    result_log = ResultLog(out_dir / RESULTS_LOG)
+    result_log.path.unlink(missing_ok=True)
+    for result in results:
+        result_log.append(result)
+    aggregate = _aggregate(run_meta, results)
+    _write_summary(out_dir, run_meta, results, aggregate)
+    _write_metrics(out_dir, run_meta, results, aggregate)
+    passed = sum(1 for r in results if r.get("pass_at_k"))
+    print(f"regraded {len(results)} tasks: {passed} pass@k", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,426 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from harness.stats import pass_at_k_estimates
+
+RESULTS_LOG = "results.jsonl"
+ATTEMPTS_JOURNAL = "attempts.jsonl"
+RATE_KEYS = ("pass_at_1", "pass_at_k", "pass_rate")
+# Per-attempt latency fields; ttft and tokens/sec exist only for streamed runs.
+LATENCY_KEYS = ("ttft_sec", "tokens_per_sec", "generation_sec")
+
+
+class ResultLog:
+    """Append-only JSONL log of finished task results, one fsync'd line each."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def append(self, record: dict[str, Any]) -> None:
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # One O_APPEND write per record: a crash can tear only the last line.
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(line)
+                while view:
+                    view = view[os.write(fd, view) :]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        if not self.path.exists():
+            return
+        with self.path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Only the last line can be torn by a crash mid-write.
+                    continue
+                if isinstance(record, dict):
+                    yield record
+
+
+class AttemptJournal(ResultLog):
+    """Per-attempt journal, so an interrupted task resumes at its next attempt.
+
+    Raw outputs live in the outputs sidecar; the journal keeps the graded
+    attempt result and when it finished.
+    """
+
+    def record(
+        self,
+        task: Any,
+        model: str,
+        attempt_result: dict[str, Any],
+        output: str,
+    ) -> None:
+        self.append(
+            {
+                "model": model,
+                "task_type": task.task_type,
+                "task_id": task.task_id,
+                "finished_at": time.time(),
+                "result": attempt_result,
+            }
+        )
+
+    def load(self) -> dict[tuple[str, str, str], dict[int, dict[str, Any]]]:
+        """Group journal entries by (model, task_type, task_id), then attempt."""
+        grouped: dict[tuple[str, str, str], dict[int, dict[str, Any]]] = {}
+        for entry in self:
+            try:
+                key = (entry["model"], entry["task_type"], entry["task_id"])
+                attempt = int(entry["result"]["attempt"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            grouped.setdefault(key, {})[attempt] = entry
+        return grouped
+
+
+def resumed_attempts(
+    entries: dict[int, dict[str, Any]], max_tries: int
+) -> list[tuple[dict[str, Any], float]]:
+    """Turn journal entries into (attempt_result, seconds since task start)."""
+    kept = [entries[a] for a in sorted(entries) if 1 <= a <= max_tries]
+    if not kept:
+        return []
+    task_start = min(
+        e["finished_at"] - (e["result"].get("elapsed_sec") or 0.0) for e in kept
+    )
+    return [(e["result"], e["finished_at"] - task_start) for e in kept]
+
+
+USAGE_KEYS = (
+    "prompt_tokens",
+    "completion_tokens",
+    "reasoning_tokens",
+    "cached_tokens",
+    "total_tokens",
+)
+
+
+def load_prices(path: Path) -> dict[str, dict[str, float]]:
+    """Read a price table: model name -> USD per million ``input``/``output``.
+
+    ``cached_input`` optionally prices cached prompt tokens.
+    """
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected an object keyed by model name")
+    return {
+        str(model): {k: float(v) for k, v in price.items()}
+        for model, price in data.items()
+        if isinstance(price, dict)
+    }
+
+
+def usage_cost(usage: dict[str, int], price: dict[str, float]) -> float:
+    """USD cost of one call's usage at ``price`` (USD per million tokens)."""
+    cached = usage.get("cached_tokens", 0)
+    prompt = usage.get("prompt_tokens", 0) - cached
+    cached_price = price.get("cached_input", price.get("input", 0.0))
+    return (
+        prompt * price.get("input", 0.0)
+        + cached * cached_price
+        + usage.get("completion_tokens", 0) * price.get("output", 0.0)
+    ) / 1_000_000
+
+
+class _Mean:
+    __slots__ = ("total", "count")
+
+    def __init__(self) -> None:
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.total += value
+        self.count += 1
+
+    @property
+    def value(self) -> float | None:
+        return self.total / self.count if self.count else None
+
+
+class _Distribution(_Mean):
+    __slots__ = ("values",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.values: list[float] = []
+
+    def add(self, value: float) -> None:
+        super().add(value)
+        self.values.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        if not self.values:
+            return None
+        ordered = sorted(self.values)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": self.value,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+        }
+
+
+class GroupStats:
+    """Running metrics for one group of task results."""
+
+    __slots__ = (
+        "tasks",
+        "rates",
+        "time_to_fix",
+        "py_coverage",
+        "samples",
+        "latency",
+        "aborts",
+        "usage",
+        "usage_attempts",
+        "cost",
+    )
+
+    def __init__(self) -> None:
+        self.tasks = 0
+        # Tasks per (attempts, passes), enough for unbiased pass@k.
+        self.samples: Counter[tuple[int, int]] = Counter()
+        self.rates = {key: _Mean() for key in RATE_KEYS}
+        self.time_to_fix = _Mean()
+        self.py_coverage = _Mean()
+        self.latency = {key: _Distribution() for key in LATENCY_KEYS}
+        # Attempts cancelled mid-stream, by reason.
+        self.aborts: Counter[str] = Counter()
+        self.usage: Counter[str] = Counter()
+        self.usage_attempts = 0
+        # None until an attempt of a priced model reports usage.
+        self.cost: float | None = None
+
+    def add(
+        self,
+        result: dict[str, Any],
+        prices: dict[str, dict[str, float]] | None = None,
+    ) -> None:
+        self.tasks += 1
+        for key in RATE_KEYS:
+            value = result.get(key)
+            if isinstance(value, (int, float, bool)):
+                self.rates[key].add(float(value))
+        if result.get("time_to_fix") not in (None, 0.0):
+            self.time_to_fix.add(result["time_to_fix"])
+        attempts = result.get("attempts")
+        if attempts:
+            passed = sum(1 for a in attempts if a.get("passed"))
+            self.samples[(len(attempts), passed)] += 1
+            price = (prices or {}).get(result.get("model", ""))
+            for attempt in attempts:
+                usage = attempt.get("usage")
+                if isinstance(usage, dict):
+                    self.usage_attempts += 1
+                    self.usage.update({k: usage[k] for k in USAGE_KEYS if k in usage})
+                    if price is not None:
+                        self.cost = (self.cost or 0.0) + usage_cost(usage, price)
+                if attempt.get("stream_abort"):
+                    self.aborts[attempt["stream_abort"]] += 1
+                for key in LATENCY_KEYS:
+                    value = attempt.get(key)
+                    if isinstance(value, (int, float)):
+                        self.latency[key].add(float(value))
+        if result.get("task_type") == "py" and attempts:
+            cov = attempts[-1]["details"].get("coverage_percent")
+            if cov is not None:
+                self.py_coverage.add(cov)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "tasks": self.tasks,
+            **{key: self.rates[key].value for key in RATE_KEYS},
+            "time_to_fix_avg": self.time_to_fix.value,
+            "py_coverage_avg": self.py_coverage.value,
+            **{f"{key}_avg": self.latency[key].value for key in LATENCY_KEYS},
+            "stream_aborts": sum(self.aborts.values()),
+            "total_tokens": self.usage["total_tokens"],
+            "tokens_per_pass": self.per_pass(self.usage["total_tokens"]),
+            "cost_usd": self.cost,
+            "cost_per_pass_usd": self.per_pass(self.cost),
+        }
+
+    def per_pass(self, amount: float | None) -> float | None:
+        """``amount`` spent per solved task (pass@k); None when nothing passed."""
+        solved = self.rates["pass_at_k"].total
+        if amount is None or not self.usage_attempts or not solved:
+            return None
+        return amount / solved
+
+    def usage_dict(self) -> dict[str, Any]:
+        return {
+            **{key: self.usage[key] for key in USAGE_KEYS},
+            "attempts_with_usage": self.usage_attempts,
+            "tokens_per_pass": self.per_pass(self.usage["total_tokens"]),
+            "cost_usd": self.cost,
+            "cost_per_pass_usd": self.per_pass(self.cost),
+        }
+
+
+def _group_keys(result: dict[str, Any], fields: tuple[str, ...]) -> list[tuple]:
+    # List-valued fields (e.g. tags) put a result in one group per value.
+    keys: list[tuple] = [()]
+    for name in fields:
+        value = result.get(name)
+        values = value if isinstance(value, (list, tuple, set)) else (value,)
+        keys = [key + (v,) for key in keys for v in values]
+    return keys
+
+
+class MetricsAggregator:
+    """Computes report metrics for several groupings in one pass over results.
+
+    ``group_by`` lists field tuples such as ``()`` (overall), ``("task_type",)``
+    or ``("model", "task_type")``. Results can be added as they arrive; each
+    one touches only the groups it belongs to. ``prices`` (see
+    :func:`load_prices`) adds USD cost to the token totals.
+    """
+
+    def __init__(
+        self,
+        group_by: Iterable[tuple[str, ...]] = ((),),
+        results: Iterable[dict[str, Any]] = (),
+        prices: dict[str, dict[str, float]] | None = None,
+    ) -> None:
+        self.prices = prices
+        self.group_by = tuple(dict.fromkeys(tuple(fields) for fields in group_by))
+        self._groups: dict[tuple[str, ...], dict[tuple, GroupStats]] = {
+            fields: {} for fields in self.group_by
+        }
+        for result in results:
+            self.add(result)
+
+    def add(self, result: dict[str, Any]) -> None:
+        for fields, groups in self._groups.items():
+            for key in _group_keys(result, fields):
+                stats = groups.get(key)
+                if stats is None:
+                    stats = groups[key] = GroupStats()
+                stats.add(result, self.prices)
+
+    def stats(self, fields: tuple[str, ...], key: tuple = ()) -> GroupStats | None:
+        return self._groups[tuple(fields)].get(tuple(key))
+
+    def rows(self, fields: tuple[str, ...]) -> list[dict[str, Any]]:
+        """One metrics row per group, ordered by group key."""
+        groups = self._groups[tuple(fields)]
+        return [
+            {**dict(zip(fields, key, strict=True)), **groups[key].as_dict()}
+            for key in sorted(groups, key=lambda k: tuple(map(str, k)))
+        ]
+
+
+class RunAggregate(MetricsAggregator):
+    """Running report aggregates, updated in O(1) per finished task.
+
+    Always tracks the overall, per-task-type and per-model groups the
+    reports need; ``group_by`` adds breakdowns for metrics.json. Produces the
+    same numbers as recomputing over the full result list, so reports can be
+    materialised at any checkpoint without rescanning.
+    """
+
+    def __init__(
+        self,
+        results: Iterable[dict[str, Any]] = (),
+        group_by: Iterable[tuple[str, ...]] = (),
+        prices: dict[str, dict[str, float]] | None = None,
+    ) -> None:
+        self.breakdowns = tuple(tuple(fields) for fields in group_by)
+        self._estimates: dict[tuple[str | None, int], tuple[int, Any]] = {}
+        super().__init__(
+            ((), ("task_type",), ("model",), *self.breakdowns), results, prices
+        )
+
+    def pass_rate(
+        self, task_type: str | None = None, key: str = "pass_at_1"
+    ) -> float | None:
+        if task_type is None:
+            stats = self.stats(())
+        else:
+            stats = self.stats(("task_type",), (task_type,))
+        return stats.rates[key].value if stats is not None else None
+
+    def pass_at_k(
+        self, task_type: str | None = None, resamples: int = 1000
+    ) -> dict[str, dict[str, Any]]:
+        """Unbiased pass@k with bootstrap CIs for every k up to the sample count."""
+        if task_type is None:
+            stats = self.stats(())
+        else:
+            stats = self.stats(("task_type",), (task_type,))
+        if stats is None:
+            return {}
+        # Summary and metrics both ask for the same scopes at a checkpoint;
+        # the bootstrap only needs rerunning when the group has grown.
+        cache_key = (task_type, resamples)
+        cached = self._estimates.get(cache_key)
+        if cached is not None and cached[0] == stats.tasks:
+            return cached[1]
+        estimates = pass_at_k_estimates(stats.samples, resamples=resamples)
+        self._estimates[cache_key] = (stats.tasks, estimates)
+        return estimates
+
+    def attempts_used(self) -> int:
+        stats = self.stats(())
+        if stats is None:
+            return 0
+        return sum(n * count for (n, _), count in stats.samples.items())
+
+    def latency(self, task_type: str | None = None) -> dict[str, dict[str, Any]]:
+        """Per-attempt latency distributions (count, mean, p50, p90)."""
+        if task_type is None:
+            stats = self.stats(())
+        else:
+            stats = self.stats(("task_type",), (task_type,))
+        if stats is None:
+            return {}
+        return {key: stats.latency[key].as_dict() for key in LATENCY_KEYS}
+
+    def stream_aborts(self) -> dict[str, int]:
+        """Attempts cancelled early by ``--early-abort``, by reason."""
+        stats = self.stats(())
+        return dict(stats.aborts) if stats is not None else {}
+
+    def usage(
+        self, task_type: str | None = None, model: str | None = None
+    ) -> dict[str, Any]:
+        """Token totals, tokens and cost per solved task, overall or for a scope."""
+        if model is not None:
+            stats = self.stats(("model",), (model,))
+        elif task_type is not None:
+            stats = self.stats(("task_type",), (task_type,))
+        else:
+            stats = self.stats(())
+        return stats.usage_dict() if stats is not None else {}
+
+    def models(self) -> list[str]:
+        return sorted(key[0] for key in self._groups[("model",)])
+
+    def time_to_fix_avg(self) -> float | None:
+        stats = self.stats(())
+        return stats.time_to_fix.value if stats is not None else None
+
+    def py_coverage_avg(self) -> float | None:
+        stats = self.stats(())
+        return stats.py_coverage.value if stats is not None else None
@@ -19,6 +19,7 @@ def choose_route(
     max_tries: int = 1,
     min_coverage: float = 90.0,
     mock: bool = False,
+    adapter: str | None = None,
 ) -> dict[str, Any]:
     tasks_root = repo_root / "tasks"
     tasks = core.list_tasks(tasks_root)
@@ -33,7 +34,7 @@ def choose_route(
     sample_py = tasks["py"][0]
     sample_md = tasks["md"][0]
 
-    model_client = default_model_client(mock=mock)
+    model_client = default_model_client(mock=mock, adapter=adapter)
     arbiter = arbiter_client() if os.environ.get("LOCAL_EVAL_ARBITER_CMD") else None
 
     py_model = core.evaluate_task(
@@ -6,6 +6,7 @@ import json
 import os
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Any
 
@@ -13,59 +14,54 @@ if __package__ in (None, ""):
     sys.path.append(str(Path(__file__).resolve().parents[1]))
 
 from harness import core
+from harness.cache import CACHE_MODES, ResponseCache, VerdictCache
+from harness.concurrency import LimitedClient, ModelLimiter
+from harness.graders.arbiter import ArbiterPool
+from harness.graders.py_pool import make_py_grader
 from harness.models import arbiter_client, default_model_client
+from harness.outputs import OUTPUTS_FILE, OutputStore
+from harness.reporting import (
+    ATTEMPTS_JOURNAL,
+    RESULTS_LOG,
+    AttemptJournal,
+    ResultLog,
+    RunAggregate,
+    load_prices,
+    resumed_attempts,
+)
 from harness.router import choose_route
+from harness.stats import ADAPTIVE_MODES
 
 
-def _pass_rate(
-    results: list[dict[str, Any]],
-    task_type: str | None = None,
-    key: str = "pass_at_1",
-) -> float | None:
-    filtered = [r for r in results if task_type is None or r["task_type"] == task_type]
-    if not filtered:
-        return None
-    values: list[float] = []
-    for r in filtered:
-        value = r.get(key)
-        if isinstance(value, (int, float, bool)):
-            values.append(float(value))
-    if not values:
-        return None
-    return sum(values) / len(values)
-
-
-def _avg_time_to_fix(results: list[dict[str, Any]]) -> float | None:
-    values = [r["time_to_fix"] for r in results if r["time_to_fix"] not in (None, 0.0)]
-    if not values:
-        return None
-    return sum(values) / len(values)
-
-
-def _avg_py_coverage(results: list[dict[str, Any]]) -> float | None:
-    cov_values = []
-    for r in results:
-        if r["task_type"] != "py":
-            continue
-        attempts = r["attempts"]
-        if not attempts:
-            continue
-        details = attempts[-1]["details"]
-        cov = details.get("coverage_percent")
-        if cov is not None:
-            cov_values.append(cov)
-    if not cov_values:
-        return None
-    return sum(cov_values) / len(cov_values)
+def _is_result(record: Any) -> bool:
+    return isinstance(record, dict) and all(
+        isinstance(record.get(key), str) for key in ("model", "task_type", "task_id")
+    )
+
+
+def _group_by(run_meta: dict[str, Any]) -> list[tuple[str, ...]]:
+    return [tuple(fields) for fields in run_meta.get("group_by") or []]
+
+
+def _aggregate(run_meta: dict[str, Any], results: list[dict[str, Any]]) -> RunAggregate:
+    return RunAggregate(
+        results, group_by=_group_by(run_meta), prices=run_meta.get("prices")
+    )
+
+
+def _summary_ks(k_max: int) -> list[int]:
+    return sorted({k for k in (1, 5, 10, k_max) if 1 <= k <= k_max})
 
 
 def _write_summary(
     report_dir: Path,
     run_meta: dict[str, Any],
     results: list[dict[str, Any]],
+    aggregate: RunAggregate | None = None,
 ) -> None:
     report_dir.mkdir(parents=True, exist_ok=True)
     summary_path = report_dir / "summary.md"
+    agg = aggregate or _aggregate(run_meta, results)
 
     lines = []
     lines.append("# Summary")
@@ -75,23 +71,26 @@ def _write_summary(
     lines.append(f"Model (code): {run_meta['code_model']}")
     lines.append("")
 
-    overall = _pass_rate(results)
-    overall_k = _pass_rate(results, key="pass_at_k")
-    overall_rate = _pass_rate(results, key="pass_rate")
-    md_rate = _pass_rate(results, "md")
-    py_rate = _pass_rate(results, "py")
-    synth_rate = _pass_rate(results, "synth")
-    lean_rate = _pass_rate(results, "lean")
-    md_k = _pass_rate(results, "md", key="pass_at_k")
-    py_k = _pass_rate(results, "py", key="pass_at_k")
-    synth_k = _pass_rate(results, "synth", key="pass_at_k")
-    lean_k = _pass_rate(results, "lean", key="pass_at_k")
-    md_rate_avg = _pass_rate(results, "md", key="pass_rate")
-    py_rate_avg = _pass_rate(results, "py", key="pass_rate")
-    synth_rate_avg = _pass_rate(results, "synth", key="pass_rate")
-    lean_rate_avg = _pass_rate(results, "lean", key="pass_rate")
-    ttf_avg = _avg_time_to_fix(results)
-    cov_avg = _avg_py_coverage(results)
+    overall = agg.pass_rate()
+    overall_k = agg.pass_rate(key="pass_at_k")
+    # Stopping at the first pass inflates per-task pass rates, so passk runs
+    # report pass@K only.
+    rates_biased = run_meta.get("adaptive") == "passk"
+    overall_rate = None if rates_biased else agg.pass_rate(key="pass_rate")
+    md_rate = agg.pass_rate("md")
+    py_rate = agg.pass_rate("py")
+    synth_rate = agg.pass_rate("synth")
+    lean_rate = agg.pass_rate("lean")
+    md_k = agg.pass_rate("md", key="pass_at_k")
+    py_k = agg.pass_rate("py", key="pass_at_k")
+    synth_k = agg.pass_rate("synth", key="pass_at_k")
+    lean_k = agg.pass_rate("lean", key="pass_at_k")
+    md_rate_avg = None if rates_biased else agg.pass_rate("md", key="pass_rate")
+    py_rate_avg = None if rates_biased else agg.pass_rate("py", key="pass_rate")
+    synth_rate_avg = None if rates_biased else agg.pass_rate("synth", key="pass_rate")
+    lean_rate_avg = None if rates_biased else agg.pass_rate("lean", key="pass_rate")
+    ttf_avg = agg.time_to_fix_avg()
+    cov_avg = agg.py_coverage_avg()
     k = run_meta.get("max_tries", 1)
 
     lines.append("## Metrics")
@@ -138,6 +137,48 @@ def _write_summary(
         lines.append(f"- pass@{k} lean: {lean_k:.2f}")
     if lean_rate_avg is not None:
         lines.append(f"- avg pass rate lean: {lean_rate_avg:.2f}")
+    unbiased = (
+        {}
+        if rates_biased
+        else agg.pass_at_k(resamples=int(run_meta.get("bootstrap", 1000)))
+    )
+    for sample_k in _summary_ks(len(unbiased)):
+        entry = unbiased[str(sample_k)]
+        ci = entry.get("ci")
+        bounds = f" [{ci[0]:.2f}, {ci[1]:.2f}]" if ci else ""
+        lines.append(
+            f"- unbiased pass@{sample_k} overall: {entry['estimate']:.2f}{bounds}"
+        )
+    if run_meta.get("adaptive", "off") != "off":
+        budget = len(results) * k
+        lines.append(f"- attempts used: {agg.attempts_used()} of {budget}")
+    latency = agg.latency()
+    ttft = latency.get("ttft_sec", {})
+    if ttft.get("count"):
+        lines.append(
+            f"- time to first token (sec): p50 {ttft['p50']:.2f}, p90 {ttft['p90']:.2f}"
+        )
+    rate = latency.get("tokens_per_sec", {})
+    if rate.get("count"):
+        lines.append(f"- tokens/sec: mean {rate['mean']:.1f}, p50 {rate['p50']:.1f}")
+    aborts = agg.stream_aborts()
+    if aborts:
+        reasons = ", ".join(f"{r} {n}" for r, n in sorted(aborts.items()))
+        total_aborts = sum(aborts.values())
+        lines.append(f"- attempts aborted mid-stream: {total_aborts} ({reasons})")
+    usage = agg.usage()
+    if usage.get("attempts_with_usage"):
+        per_pass = usage["tokens_per_pass"]
+        lines.append(
+            f"- tokens: {usage['total_tokens']} total"
+            + (f", {per_pass:.0f} per solved task" if per_pass is not None else "")
+        )
+    if usage.get("cost_usd") is not None:
+        cost_per_pass = usage["cost_per_pass_usd"]
+        lines.append(
+            f"- cost (USD): {usage['cost_usd']:.4f}"
+            + (f", {cost_per_pass:.4f} per solved task" if cost_per_pass else "")
+        )
     if ttf_avg is not None:
         lines.append(f"- avg time-to-fix (sec): {ttf_avg:.2f}")
     else:
@@ -161,37 +202,66 @@ def _write_metrics(
     report_dir: Path,
     run_meta: dict[str, Any],
     results: list[dict[str, Any]],
+    aggregate: RunAggregate | None = None,
 ) -> None:
     report_dir.mkdir(parents=True, exist_ok=True)
     metrics_path = report_dir / "metrics.json"
+    agg = aggregate or _aggregate(run_meta, results)
+    resamples = int(run_meta.get("bootstrap", 1000))
+    rates_biased = run_meta.get("adaptive") == "passk"
 
     metrics = {
         "run": run_meta,
         "results": results,
         "pass_at_1": {
-            "overall": _pass_rate(results),
-            "md": _pass_rate(results, "md"),
-            "py": _pass_rate(results, "py"),
-            "synth": _pass_rate(results, "synth"),
-            "lean": _pass_rate(results, "lean"),
+            "overall": agg.pass_rate(),
+            "md": agg.pass_rate("md"),
+            "py": agg.pass_rate("py"),
+            "synth": agg.pass_rate("synth"),
+            "lean": agg.pass_rate("lean"),
         },
         "pass_at_k": {
-            "overall": _pass_rate(results, key="pass_at_k"),
-            "md": _pass_rate(results, "md", key="pass_at_k"),
-            "py": _pass_rate(results, "py", key="pass_at_k"),
-            "synth": _pass_rate(results, "synth", key="pass_at_k"),
-            "lean": _pass_rate(results, "lean", key="pass_at_k"),
+            "overall": agg.pass_rate(key="pass_at_k"),
+            "md": agg.pass_rate("md", key="pass_at_k"),
+            "py": agg.pass_rate("py", key="pass_at_k"),
+            "synth": agg.pass_rate("synth", key="pass_at_k"),
+            "lean": agg.pass_rate("lean", key="pass_at_k"),
+        },
+        "pass_rate": None
+        if rates_biased
+        else {
+            "overall": agg.pass_rate(key="pass_rate"),
+            "md": agg.pass_rate("md", key="pass_rate"),
+            "py": agg.pass_rate("py", key="pass_rate"),
+            "synth": agg.pass_rate("synth", key="pass_rate"),
+            "lean": agg.pass_rate("lean", key="pass_rate"),
         },
-        "pass_rate": {
-            "overall": _pass_rate(results, key="pass_rate"),
-            "md": _pass_rate(results, "md", key="pass_rate"),
-            "py": _pass_rate(results, "py", key="pass_rate"),
-            "synth": _pass_rate(results, "synth", key="pass_rate"),
-            "lean": _pass_rate(results, "lean", key="pass_rate"),
+        "pass_at_k_unbiased": None
+        if rates_biased
+        else {
+            scope: agg.pass_at_k(
+                None if scope == "overall" else scope, resamples=resamples
+            )
+            for scope in ("overall", "md", "py", "synth", "lean")
+        },
+        "attempts_used": agg.attempts_used(),
+        "latency": {
+            scope: agg.latency(None if scope == "overall" else scope)
+            for scope in ("overall", "md", "py", "synth", "lean")
         },
-        "time_to_fix_avg": _avg_time_to_fix(results),
-        "py_coverage_avg": _avg_py_coverage(results),
+        "stream_aborts": agg.stream_aborts(),
+        "usage": {
+            "overall": agg.usage(),
+            **{t: agg.usage(t) for t in ("md", "py", "synth", "lean")},
+            "models": {m: agg.usage(model=m) for m in agg.models()},
+        },
+        "time_to_fix_avg": agg.time_to_fix_avg(),
+        "py_coverage_avg": agg.py_coverage_avg(),
     }
+    if agg.breakdowns:
+        metrics["groups"] = {
+            ",".join(fields): agg.rows(fields) for fields in agg.breakdowns
+        }
     metrics_path.write_text(json.dumps(metrics, indent=2), encoding="utf-8")
 
     csv_path = report_dir / "metrics.csv"
@@ -206,6 +276,7 @@ def _write_metrics(
                 "pass_at_k",
                 "pass_rate",
                 "time_to_fix",
+                "total_tokens",
             ]
         )
         for r in results:
@@ -218,11 +289,19 @@ def _write_metrics(
                     r.get("pass_at_k"),
                     r.get("pass_rate"),
                     r["time_to_fix"],
+                    (r.get("usage") or {}).get("total_tokens"),
                 ]
             )
 
 
-def main() -> None:
+def main(argv: list[str] | None = None) -> None:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv and argv[0] == "regrade":
+        from harness.regrade import main as regrade_main
+
+        regrade_main(argv[1:])
+        return
+
     parser = argparse.ArgumentParser()
     parser.add_argument("--model", default="gpt-5.2")
     parser.add_argument("--codegen", default=None)
@@ -234,7 +313,34 @@ def main() -> None:
     parser.add_argument("--resume", action="store_true")
     parser.add_argument("--continue-on-error", action="store_true")
     parser.add_argument("--task-types", default="md,py,synth,lean")
-    args = parser.parse_args()
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--model-concurrency", type=int, default=0)
+    parser.add_argument("--model-rpm", type=float, default=0.0)
+    parser.add_argument("--parallel-attempts", action="store_true")
+    parser.add_argument("--stream", action="store_true")
+    parser.add_argument("--early-abort", action="store_true")
+    parser.add_argument("--prices", default=None)
+    parser.add_argument("--adapter", choices=["cmd", "openai"], default=None)
+    parser.add_argument("--cache-mode", choices=CACHE_MODES, default="off")
+    parser.add_argument("--cache-dir", default=".cache/responses")
+    parser.add_argument("--cache-max-mb", type=float, default=512.0)
+    parser.add_argument("--py-warm", action="store_true")
+    parser.add_argument("--py-workers", type=int, default=0)
+    parser.add_argument("--py-timeout", type=float, default=300.0)
+    parser.add_argument("--checkpoint-every", type=int, default=10)
+    parser.add_argument("--group-by", action="append", default=None)
+    parser.add_argument("--bootstrap", type=int, default=1000)
+    parser.add_argument("--adaptive", choices=ADAPTIVE_MODES, default="off")
+    parser.add_argument("--adaptive-width", type=float, default=0.5)
+    parser.add_argument("--min-tries", type=int, default=2)
+    parser.add_argument("--arbiter-workers", type=int, default=8)
+    parser.add_argument("--arbiter-always", action="store_true")
+    parser.add_argument(
+        "--verdict-cache-mode", choices=CACHE_MODES, default="readwrite"
+    )
+    parser.add_argument("--verdict-cache-dir", default=".cache/verdicts")
+    parser.add_argument("--verdict-cache-max-mb", type=float, default=64.0)
+    args = parser.parse_args(argv)
 
     repo_root = Path(__file__).resolve().parents[1]
     tasks_root = repo_root / "tasks"
@@ -257,6 +363,7 @@ def main() -> None:
             max_tries=1,
             min_coverage=args.min_coverage,
             mock=args.mock,
+            adapter=args.adapter,
         )
         logic_model = route["logic_model"]
         code_model = route["code_model"]
@@ -264,21 +371,51 @@ def main() -> None:
         logic_model = args.model
         code_model = args.codegen or args.model
 
-    model_client = default_model_client(mock=args.mock)
-    arbiter = arbiter_client() if os.environ.get("LOCAL_EVAL_ARBITER_CMD") else None
+    model_client = default_model_client(mock=args.mock, adapter=args.adapter)
+    if args.cache_mode != "off":
+        model_client.cache = ResponseCache(
+            repo_root / args.cache_dir,
+            max_bytes=int(args.cache_max_mb * 1024 * 1024),
+        )
+        model_client.cache_mode = args.cache_mode
+    arbiter = None
+    if os.environ.get("LOCAL_EVAL_ARBITER_CMD"):
+        arbiter = ArbiterPool(
+            arbiter_client(),
+            workers=args.arbiter_workers,
+            always_run=args.arbiter_always,
+            cache=VerdictCache(
+                repo_root / args.verdict_cache_dir,
+                max_bytes=int(args.verdict_cache_max_mb * 1024 * 1024),
+            ),
+            cache_mode=args.verdict_cache_mode,
+        )
 
     results: list[dict[str, Any]] = []
     report_dir = repo_root / args.reports_dir
-    existing_ids: set[str] = set()
+    result_log = ResultLog(report_dir / RESULTS_LOG)
+    journal = AttemptJournal(report_dir / ATTEMPTS_JOURNAL)
+    if not args.resume:
+        result_log.path.unlink(missing_ok=True)
+        journal.path.unlink(missing_ok=True)
     metrics_path = report_dir / "metrics.json"
-    if args.resume and metrics_path.exists():
-        data = json.loads(metrics_path.read_text(encoding="utf-8"))
-        existing_results = data.get("results", [])
-        if isinstance(existing_results, list):
-            results.extend(existing_results)
-            existing_ids = {
-                r.get("task_id") for r in existing_results if isinstance(r, dict)
-            }
+    journaled: dict[tuple[str, str, str], dict[int, dict[str, Any]]] = {}
+    if args.resume:
+        # The results log is fsync'd per task, so it is ahead of metrics.json
+        # whenever a run stopped between checkpoints.
+        results.extend(r for r in result_log if _is_result(r))
+        if not results and metrics_path.exists():
+            try:
+                data = json.loads(metrics_path.read_text(encoding="utf-8"))
+            except ValueError:
+                data = {}
+            existing_results = data.get("results") if isinstance(data, dict) else None
+            if isinstance(existing_results, list):
+                results.extend(r for r in existing_results if _is_result(r))
+                for r in results:
+                    result_log.append(r)
+        journaled = journal.load()
+    done_keys = {(r["model"], r["task_type"], r["task_id"]) for r in results}
 
     run_meta = {
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
@@ -288,17 +425,55 @@ def main() -> None:
         "min_coverage": args.min_coverage,
         "mock": args.mock,
         "task_types": task_types,
+        "jobs": args.jobs,
+        "parallel_attempts": args.parallel_attempts,
+        "stream": args.stream,
+        "early_abort": args.early_abort,
+        "prices": load_prices(Path(args.prices)) if args.prices else None,
+        "cache_mode": args.cache_mode,
+        "bootstrap": args.bootstrap,
+        "adaptive": args.adaptive,
+        "group_by": [
+            [f.strip() for f in spec.split(",") if f.strip()]
+            for spec in args.group_by or ["model,task_type"]
+        ],
     }
 
-    tasks_to_run = [t for t in tasks_all if t.task_id not in existing_ids]
+    output_store = OutputStore(report_dir / OUTPUTS_FILE)
+    if not args.resume and output_store.path.exists():
+        output_store.path.unlink()
+
+    def model_for(task: core.Task) -> str:
+        return code_model if task.task_type == "py" else logic_model
+
+    tasks_to_run = [
+        t for t in tasks_all if (model_for(t), t.task_type, t.task_id) not in done_keys
+    ]
     total = len(tasks_to_run)
+    jobs = max(1, args.jobs)
+    if args.model_concurrency > 0 or args.model_rpm > 0:
+        model_client = LimitedClient(
+            model_client, ModelLimiter(args.model_concurrency, rpm=args.model_rpm)
+        )
 
-    for idx, task in enumerate(tasks_to_run, start=1):
-        model_name = code_model if task.task_type == "py" else logic_model
+    def on_attempt(
+        task: core.Task, model: str, attempt_result: dict[str, Any], output: str
+    ) -> None:
+        output_store.record(task, model, attempt_result, output)
+        journal.record(task, model, attempt_result, output)
+
+    def run_one(idx: int, task: core.Task) -> dict[str, Any]:
+        model_name = model_for(task)
+        resume_from = resumed_attempts(
+            journaled.get((model_name, task.task_type, task.task_id), {}),
+            args.max_tries,
+        )
         message = (
             f"[{idx}/{total}] start {task.task_id} ({task.task_type}) "
             f"model={model_name}"
         )
+        if resume_from:
+            message += f" resuming after {len(resume_from)} attempt(s)"
         print(message, flush=True)
         task_start = time.time()
         try:
@@ -311,6 +486,15 @@ def main() -> None:
                 min_coverage=args.min_coverage,
                 arbiter=arbiter,
                 continue_on_error=args.continue_on_error,
+                parallel_attempts=args.parallel_attempts,
+                on_attempt=on_attempt,
+                py_grader=py_grader,
+                resume_from=resume_from,
+                adaptive=args.adaptive,
+                adaptive_width=args.adaptive_width,
+                min_tries=args.min_tries,
+                stream=args.stream,
+                early_abort=args.early_abort,
             )
         except Exception as exc:
             elapsed = time.time() - task_start
@@ -320,7 +504,6 @@ def main() -> None:
                 flush=True,
             )
             raise
-        results.append(result)
         elapsed = time.time() - task_start
         status = "PASS" if result.get("pass_at_k") else "FAIL"
         model_error = None
@@ -332,11 +515,51 @@ def main() -> None:
             f"status={status} elapsed={elapsed:.1f}s{suffix}",
             flush=True,
         )
-        _write_summary(report_dir, run_meta, results)
-        _write_metrics(report_dir, run_meta, results)
+        return result
+
+    py_grader = make_py_grader(
+        repo_root,
+        workers=args.py_workers,
+        warm=args.py_warm,
+        timeout=args.py_timeout or None,
+        threads=jobs,
+    )
+
+    # Results are reported in task order regardless of completion order so
+    # metrics.json stays deterministic across --jobs settings.
+    completed: dict[int, dict[str, Any]] = {}
+    base_results = list(results)
+    aggregate = _aggregate(run_meta, base_results)
+    checkpoint_every = max(1, args.checkpoint_every)
+
+    def checkpoint() -> None:
+        ordered = base_results + [completed[i] for i in sorted(completed)]
+        _write_summary(report_dir, run_meta, ordered, aggregate)
+        _write_metrics(report_dir, run_meta, ordered, aggregate)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(run_one, idx, task): idx
+            for idx, task in enumerate(tasks_to_run, start=1)
+        }
+        try:
+            for future in as_completed(futures):
+                result = future.result()
+                completed[futures[future]] = result
+                result_log.append(result)
+                aggregate.add(result)
+                if len(completed) % checkpoint_every == 0:
+                    checkpoint()
+        except BaseException:
+            pool.shutdown(wait=True, cancel_futures=True)
+            checkpoint()
+            raise
+        finally:
+            py_grader.close()
+            if arbiter is not None:
+                arbiter.close()
 
-    _write_summary(report_dir, run_meta, results)
-    _write_metrics(report_dir, run_meta, results)
+    checkpoint()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import random
+from collections import Counter
+from collections.abc import Mapping
+from itertools import accumulate
+from typing import Any
+
+Sample = tuple[int, int]  # (attempts drawn, attempts passed) for one task
+
+
+def pass_at_k_curve(n: int, c: int) -> list[float]:
+    """Unbiased pass@k for every k in 1..n from n samples with c correct.
+
+    Uses pass@k = 1 - C(n-c, k) / C(n, k), with the ratio built up by the
+    product recurrence r_k = r_{k-1} * (n-c-k+1) / (n-k+1), so the whole curve
+    costs O(n) and never forms large binomials.
+    """
+    curve: list[float] = []
+    ratio = 1.0
+    for k in range(1, n + 1):
+        ratio *= max(n - c - k + 1, 0) / (n - k + 1)
+        curve.append(1.0 - ratio)
+    return curve
+
+
+def _mean_curve(samples: Mapping[Sample, int], k_max: int) -> list[float | None]:
+    totals = [0.0] * k_max
+    counts = [0] * k_max
+    for (n, c), weight in samples.items():
+        for k, value in enumerate(pass_at_k_curve(n, c)[:k_max]):
+            totals[k] += value * weight
+            counts[k] += weight
+    return [t / m if m else None for t, m in zip(totals, counts, strict=True)]
+
+
+def pass_at_k_estimates(
+    samples: Mapping[Sample, int],
+    resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> dict[str, dict[str, Any]]:
+    """Mean unbiased pass@k over tasks for every k, with bootstrap CIs.
+
+    ``samples`` counts tasks per (n, c). A task contributes to pass@k only
+    when it has at least k samples. Confidence intervals come from resampling
+    tasks with replacement; tasks with equal (n, c) are interchangeable, so
+    each resample only needs a count per distinct (n, c).
+    """
+    classes = [key for key, weight in samples.items() if weight > 0 and key[0] > 0]
+    if not classes:
+        return {}
+    k_max = max(n for n, _ in classes)
+    estimate = _mean_curve(samples, k_max)
+    curves = [pass_at_k_curve(n, c) for n, c in classes]
+    weights = list(accumulate(samples[key] for key in classes))
+    tasks = weights[-1]
+
+    draws: list[list[float]] = [[] for _ in range(k_max)]
+    rng = random.Random(seed)
+    for _ in range(resamples):
+        picked = Counter(rng.choices(range(len(classes)), cum_weights=weights, k=tasks))
+        totals = [0.0] * k_max
+        counts = [0] * k_max
+        for idx, weight in picked.items():
+            for k, value in enumerate(curves[idx]):
+                totals[k] += value * weight
+                counts[k] += weight
+        for k in range(k_max):
+            if counts[k]:
+                draws[k].append(totals[k] / counts[k])
+
+    alpha = (1.0 - confidence) / 2
+    out: dict[str, dict[str, Any]] = {}
+    for k in range(k_max):
+        if estimate[k] is None:
+            continue
+        entry: dict[str, Any] = {
+            "estimate": estimate[k],
+            "tasks": sum(w for (n, _), w in samples.items() if n > k),
+        }
+        values = sorted(draws[k])
+        if values:
+            lo = values[int(alpha * (len(values) - 1))]
+            hi = values[int((1.0 - alpha) * (len(values) - 1) + 0.5)]
+            entry["ci"] = [lo, hi]
+        out[str(k + 1)] = entry
+    return out
+
+
+ADAPTIVE_MODES = ("off", "ci", "passk")
+
+
+def wilson_interval(passes: int, n: int, z: float = 1.96) -> tuple[float, float]:
+    """Wilson score interval for a pass rate; (0, 1) when there are no samples."""
+    if n <= 0:
+        return 0.0, 1.0
+    p = passes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * ((p * (1 - p) / n + z * z / (4 * n * n)) ** 0.5) / denom
+    return max(center - half, 0.0), min(center + half, 1.0)
+
+
+def should_stop_sampling(
+    passed: list[bool], mode: str, max_width: float = 0.5, min_samples: int = 2
+) -> bool:
+    """Whether an adaptive run has drawn enough attempts for one task.
+
+    ``ci`` stops once the Wilson interval on the task's pass rate is at most
+    ``max_width`` wide; ``passk`` stops at the first pass, which settles
+    pass@K.
+    """
+    if mode == "passk":
+        return any(passed)
+    if mode == "ci":
+        if len(passed) < max(min_samples, 1):
+            return False
+        lo, hi = wilson_interval(sum(passed), len(passed))
+        return hi - lo <= max_width
+    return False
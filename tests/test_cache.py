@@ -0,0 +1,94 @@
+import os
+
+from harness.cache import DiskCache, ResponseCache, VerdictCache
+from harness.graders.arbiter import ArbiterPool
+from harness.models import ModelClient
+
+
+class _CountingAdapter:
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, model):
+        self.calls += 1
+        return f"{prompt}:{self.calls}"
+
+    def sampling_params(self):
+        return {"temperature": 0}
+
+
+def test_model_client_reads_cached_generation(tmp_path):
+    adapter = _CountingAdapter()
+    client = ModelClient(
+        cmd_template=None,
+        adapter=adapter,
+        cache=ResponseCache(tmp_path),
+        cache_mode="readwrite",
+    )
+    first = client.generate("p", "m", "md", "t01", attempt=1)
+    assert client.generate("p", "m", "md", "t01", attempt=1) == first
+    assert client.generate("p", "m", "md", "t01", attempt=2) != first
+    assert adapter.calls == 2
+
+
+def test_read_mode_does_not_store(tmp_path):
+    adapter = _CountingAdapter()
+    client = ModelClient(
+        cmd_template=None,
+        adapter=adapter,
+        cache=ResponseCache(tmp_path),
+        cache_mode="read",
+    )
+    client.generate("p", "m", "md", "t01")
+    client.generate("p", "m", "md", "t01")
+    assert adapter.calls == 2
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(tmp_path, max_bytes=400)
+    cache.put("aa1", "x" * 100)
+    cache.put("bb2", "y" * 100)
+    os.utime(cache._path("aa1"), (0, 0))
+    os.utime(cache._path("bb2"), (1, 1))
+    assert cache.get("aa1") == "x" * 100  # bumps aa1 to most recent
+    cache.put("cc3", "z" * 100)
+    cache.put("dd4", "w" * 100)
+    assert cache.get("bb2") is None
+    assert cache.get("dd4") == "w" * 100
+
+
+class _CountingArbiter:
+    cmd_template = "fake"
+
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = 0
+
+    def generate(self, prompt, model, task_type, task_id):
+        self.calls += 1
+        return self.reply
+
+    def sampling_params(self):
+        return {"cmd_template": self.cmd_template, "reply": self.reply}
+
+
+def test_arbiter_pool_reuses_cached_verdicts(tmp_path):
+    cache = VerdictCache(tmp_path)
+    first = _CountingArbiter("PASS")
+    pool = ArbiterPool(first, cache=cache, cache_mode="readwrite")
+    try:
+        assert pool.submit("task", "answer").result() is True
+        assert pool.submit("task", "answer").result() is True
+        assert pool.submit("task", "other answer").result() is True
+    finally:
+        pool.close()
+    assert first.calls == 2
+
+    # A different arbiter configuration does not see those verdicts.
+    second = _CountingArbiter("FAIL")
+    pool = ArbiterPool(second, cache=cache, cache_mode="readwrite")
+    try:
+        assert pool.submit("task", "answer").result() is False
+    finally:
+        pool.close()
+    assert second.calls == 1
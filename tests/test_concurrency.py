@@ -0,0 +1,71 @@
+import threading
+import time
+
+from harness.cache import ResponseCache
+from harness.concurrency import LimitedClient, ModelLimiter, TokenBucket
+from harness.models import ModelClient
+
+
+class _SlowClient:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def generate(self, prompt, model, task_type, task_id, attempt=1):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return prompt
+
+
+def test_limited_client_caps_per_model_concurrency():
+    inner = _SlowClient()
+    client = LimitedClient(inner, ModelLimiter(2))
+    threads = [
+        threading.Thread(target=client.generate, args=("p", "m", "md", str(i)))
+        for i in range(6)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert inner.peak <= 2
+
+
+def test_token_bucket_spaces_requests_after_burst():
+    now = [0.0]
+    waits = []
+
+    def sleep(seconds):
+        waits.append(seconds)
+        now[0] += seconds
+
+    bucket = TokenBucket(2.0, burst=2, clock=lambda: now[0], sleep=sleep)
+    for _ in range(4):
+        bucket.acquire()
+    assert waits == [0.5, 0.5]
+
+
+def test_cached_replays_skip_the_limiter(tmp_path):
+    class _CountingLimiter(ModelLimiter):
+        def __init__(self):
+            super().__init__(1, rpm=60)
+            self.charges = []
+
+        def slot(self, model, charge=True):
+            self.charges.append(charge)
+            return super().slot(model, charge)
+
+    limiter = _CountingLimiter()
+    inner = ModelClient(
+        cmd_template="cat", cache=ResponseCache(tmp_path), cache_mode="readwrite"
+    )
+    client = LimitedClient(inner, limiter)
+    outputs = [client.generate("p", "m", "md", "t01") for _ in range(3)]
+    assert outputs == ["p"] * 3
+    # Only the first call reached the command; the replays hit the cache.
+    assert limiter.charges == [True]
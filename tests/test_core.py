@@ -0,0 +1,262 @@
+import threading
+import time
+
+import pytest
+
+from harness import core
+from harness.graders.arbiter import ArbiterPool
+from harness.reporting import AttemptJournal, resumed_attempts
+
+GOOD = (
+    "Verdict: true.\n"
+    "Proof sketch: the base case n=1 holds and the step follows by a standard bound."
+)
+
+
+def _md_task(tmp_path):
+    path = tmp_path / "t01.md"
+    path.write_text(
+        "# Task\n\n<!-- rubric:\nmust: Verdict:\nmust: Proof sketch:\n-->\n",
+        encoding="utf-8",
+    )
+    return core.Task(task_id="t01", task_type="md", path=path)
+
+
+class _ScriptedClient:
+    """Returns the n-th scripted answer on the n-th call."""
+
+    def __init__(self, answers, delays=None):
+        self.answers = answers
+        self.delays = delays or [0.0] * len(answers)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def generate(self, prompt, model, task_type, task_id, attempt=1, **callbacks):
+        with self.lock:
+            idx = self.calls
+            self.calls += 1
+        time.sleep(self.delays[idx])
+        return self.answers[idx]
+
+
+def test_evaluate_task_journals_previous_attempt_when_generation_fails(tmp_path):
+    class _FailingSecond(_ScriptedClient):
+        def generate(self, prompt, model, task_type, task_id, attempt=1, **cb):
+            if attempt == 2:
+                raise RuntimeError("adapter down")
+            return super().generate(prompt, model, task_type, task_id, attempt)
+
+    recorded = []
+    with pytest.raises(RuntimeError):
+        core.evaluate_task(
+            _md_task(tmp_path),
+            _FailingSecond(["nope", GOOD]),
+            "m",
+            tmp_path,
+            max_tries=2,
+            on_attempt=lambda t, m, r, o: recorded.append(r["attempt"]),
+        )
+    assert recorded == [1]
+
+
+def test_evaluate_task_sequential_time_to_fix(tmp_path):
+    task = _md_task(tmp_path)
+    client = _ScriptedClient(["nope", GOOD, GOOD])
+    result = core.evaluate_task(task, client, "m", tmp_path, max_tries=3)
+    assert result["pass_at_1"] is False
+    assert result["pass_at_k"] is True
+    assert result["time_to_fix"] is not None
+
+
+def test_evaluate_task_parallel_keeps_attempt_order(tmp_path):
+    task = _md_task(tmp_path)
+    client = _ScriptedClient(["nope", GOOD, GOOD], delays=[0.05, 0.0, 0.0])
+    result = core.evaluate_task(
+        task, client, "m", tmp_path, max_tries=3, parallel_attempts=True
+    )
+    assert client.calls == 3
+    assert [a["attempt"] for a in result["attempts"]] == [1, 2, 3]
+    assert result["pass_at_k"] is True
+    assert result["pass_rate"] == 2 / 3
+    # Attempt 2 finished first, but the fix still comes after attempt 1.
+    assert result["time_to_fix"] == result["attempts"][1]["elapsed_sec"] > 0.0
+
+
+def test_evaluate_task_resumes_at_next_attempt(tmp_path):
+    task = _md_task(tmp_path)
+    journal = AttemptJournal(tmp_path / "attempts.jsonl")
+    core.evaluate_task(
+        task,
+        _ScriptedClient(["nope", "still nope"]),
+        "m",
+        tmp_path,
+        max_tries=2,
+        on_attempt=journal.record,
+    )
+    with journal.path.open("a", encoding="utf-8") as f:
+        f.write('{"model": "m", "task_')  # torn by a crash
+
+    entries = journal.load()[("m", "md", "t01")]
+    client = _ScriptedClient([GOOD])
+    result = core.evaluate_task(
+        task,
+        client,
+        "m",
+        tmp_path,
+        max_tries=3,
+        resume_from=resumed_attempts(entries, 3),
+    )
+    assert client.calls == 1
+    assert [a["passed"] for a in result["attempts"]] == [False, False, True]
+    assert result["pass_rate"] == 1 / 3
+    assert 0.0 <= result["time_to_fix"] < 5.0
+
+
+def test_evaluate_task_adaptive_stops_once_settled(tmp_path):
+    task = _md_task(tmp_path)
+    client = _ScriptedClient(["nope", GOOD, GOOD, GOOD, GOOD])
+    result = core.evaluate_task(
+        task, client, "m", tmp_path, max_tries=5, adaptive="passk"
+    )
+    assert client.calls == 2
+    assert result["attempts_used"] == 2
+    assert result["attempts_total"] == 5
+    assert result["pass_rate"] == 0.5
+
+    client = _ScriptedClient(["nope"] * 20)
+    result = core.evaluate_task(
+        task, client, "m", tmp_path, max_tries=20, adaptive="ci"
+    )
+    assert 2 <= result["attempts_used"] < 20
+    assert result["pass_at_k"] is False
+
+
+class _StreamingClient:
+    def generate(self, prompt, model, task_type, task_id, attempt=1, **callbacks):
+        time.sleep(0.05)
+        for token in GOOD.split(" "):
+            callbacks["on_token"](token)
+            time.sleep(0.002)
+        callbacks["on_meta"]({"endpoint": "chat", "usage": {"total_tokens": 9}})
+        return GOOD
+
+
+def test_evaluate_task_records_stream_latency(tmp_path):
+    task = _md_task(tmp_path)
+    result = core.evaluate_task(
+        task, _StreamingClient(), "m", tmp_path, max_tries=1, stream=True
+    )
+    attempt = result["attempts"][0]
+    assert 0.05 <= attempt["ttft_sec"] < attempt["generation_sec"]
+    assert attempt["stream_tokens"] == len(GOOD.split(" "))
+    assert attempt["tokens_per_sec"] > 0
+    assert attempt["usage"] == {"total_tokens": 9}
+    assert attempt["adapter_meta"] == {"endpoint": "chat"}
+    assert result["usage"] == {"total_tokens": 9}
+
+
+def _synth_task(tmp_path):
+    path = tmp_path / "s01.md"
+    path.write_text("# Task\n\n<!-- rubric:\nmust: Lemma:\n-->\n", encoding="utf-8")
+    return core.Task(task_id="s01", task_type="synth", path=path)
+
+
+def test_evaluate_task_early_abort_cancels_runaway_stream(tmp_path):
+    class _RunawayClient:
+        tokens = 0
+
+        def generate(self, prompt, model, task_type, task_id, attempt=1, **cb):
+            for _ in range(1000):
+                self.tokens += 1
+                cb["on_token"]("word ")
+            return "word " * 1000
+
+    client = _RunawayClient()
+    result = core.evaluate_task(
+        _synth_task(tmp_path), client, "m", tmp_path, early_abort=True
+    )
+    attempt = result["attempts"][0]
+    assert client.tokens == 221
+    assert attempt["stream_abort"] == "word_count>220"
+    assert attempt["passed"] is False
+    assert attempt["details"]["word_count"] == 221
+
+
+class _OverlapProbe:
+    """Generation client and arbiter that log calls and wait on each other.
+
+    Generation n+1 does not return until arbiter call n has started, and
+    arbiter call n does not return until generation n+1 has started, so the
+    run only completes promptly if the two overlap.
+    """
+
+    def __init__(self, answer, tries):
+        self.answer = answer
+        self.tries = tries
+        self.log = []
+        self.waits = []
+        self.lock = threading.Lock()
+        self.gen_started = {n: threading.Event() for n in range(1, tries + 1)}
+        self.arb_started = {n: threading.Event() for n in range(1, tries + 1)}
+        self.gens = self.arbs = 0
+
+    def _record(self, event, n):
+        with self.lock:
+            self.log.append((event, n))
+
+    def generate(self, prompt, model, task_type, task_id, attempt=1, **callbacks):
+        with self.lock:
+            self.gens += 1
+            n = self.gens
+        self._record("gen_start", n)
+        self.gen_started[n].set()
+        if n > 1:
+            self.waits.append(self.arb_started[n - 1].wait(5))
+        self._record("gen_end", n)
+        return self.answer
+
+    def verdict(self, prompt, model, task_type, task_id):
+        with self.lock:
+            self.arbs += 1
+            n = self.arbs
+        self._record("arb_start", n)
+        self.arb_started[n].set()
+        if n < self.tries:
+            self.waits.append(self.gen_started[n + 1].wait(5))
+        self._record("arb_end", n)
+        return "FAIL"
+
+
+class _ProbeArbiter:
+    cmd_template = "fake"
+
+    def __init__(self, probe):
+        self.generate = probe.verdict
+
+
+def test_evaluate_task_overlaps_pooled_arbiter_with_generation(tmp_path):
+    task = _md_task(tmp_path)
+    probe = _OverlapProbe(GOOD, 3)
+    arbiter = ArbiterPool(_ProbeArbiter(probe))
+    recorded = []
+    try:
+        result = core.evaluate_task(
+            task,
+            probe,
+            "m",
+            tmp_path,
+            max_tries=3,
+            arbiter=arbiter,
+            on_attempt=lambda t, m, r, o: recorded.append(r["passed"]),
+        )
+    finally:
+        arbiter.close()
+    assert probe.waits == [True] * 4
+    log = probe.log.index
+    for n in (1, 2):
+        # Arbiter call n is in flight while generation n + 1 runs.
+        assert log(("arb_start", n)) < log(("gen_end", n + 1))
+        assert log(("gen_start", n + 1)) < log(("arb_end", n))
+    assert recorded == [False, False, False]
+    assert result["pass_at_k"] is False
+    assert [a["details"]["arbiter_pass"] for a in result["attempts"]] == [False] * 3
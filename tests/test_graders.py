@@ -1,4 +1,5 @@
-from harness.graders import grade_lean, grade_md
+from harness.graders import grade_lean, grade_md, grade_synth, rubric
+from harness.graders.rubric import load_rubric
 
 
 def test_grade_md_pass(tmp_path):
@@ -67,3 +68,84 @@ must: exists
     )
     result = grade_lean.evaluate(task, answer)
     assert result["passed"] is True
+
+
+def test_rubric_is_compiled_once_and_reloaded_on_change(tmp_path):
+    task = tmp_path / "t.md"
+    task.write_text(
+        "<!-- rubric:\nmust: re:\\bn\\s*=\\s*1\\b\nshould: Edge Case\n-->",
+        encoding="utf-8",
+    )
+    first = load_rubric(task, grade_md._parse_rubric)
+    assert load_rubric(task, grade_md._parse_rubric) is first
+    assert first.must[0].regex is not None
+    assert first.check("an EDGE CASE at n = 1") == ([], 1)
+
+    task.write_text("<!-- rubric:\nmust: Verdict:\n-->\n", encoding="utf-8")
+    second = load_rubric(task, grade_md._parse_rubric)
+    assert second is not first
+    assert second.check("no verdict here") == (["Verdict:"], 0)
+
+
+def test_pattern_set_automaton_matches_individual_scans(monkeypatch):
+    monkeypatch.setattr(rubric, "AUTOMATON_MIN_LITERALS", 2)
+    raw = ["Verdict:", "proof sketch", "n=1", "sketch:", "absent", "re:n\\s*=\\s*2"]
+    patterns = tuple(rubric.compile_pattern(p) for p in raw)
+    matcher = rubric.PatternSet(patterns)
+    assert matcher._automaton is not None
+    answer = "VERDICT: false. Proof sketch: try n=1 and n = 2."
+    expected = {i for i, p in enumerate(patterns) if p.matches(answer, answer.lower())}
+    assert matcher.hits(answer) == expected == {0, 1, 2, 3, 5}
+
+
+class _CountingArbiter:
+    cmd_template = "fake"
+
+    def __init__(self, always_run=False):
+        self.always_run = always_run
+        self.calls = 0
+
+    def generate(self, prompt, model, task_type, task_id):
+        self.calls += 1
+        return "PASS"
+
+
+def test_arbiter_skipped_when_heuristics_fail(tmp_path):
+    task = tmp_path / "t.md"
+    task.write_text("# Task\n\n<!-- rubric:\nmust: Verdict:\n-->\n", encoding="utf-8")
+    good = "Verdict: true, since the bound holds for every n by the standard argument."
+
+    arbiter = _CountingArbiter()
+    assert grade_md.evaluate(task, "too short", arbiter=arbiter)["arbiter_pass"] is None
+    assert grade_md.evaluate(task, good, arbiter=arbiter)["arbiter_pass"] is True
+    assert arbiter.calls == 1
+
+    calibrating = _CountingArbiter(always_run=True)
+    result = grade_md.evaluate(task, "too short", arbiter=calibrating)
+    assert result["arbiter_pass"] is True
+    assert result["passed"] is False
+    assert calibrating.calls == 1
+
+
+def test_stream_violations_flag_only_unrecoverable_prefixes():
+    assert grade_synth.stream_violation("Lemma: short.\n\nProof sketch: ok.") is None
+    assert grade_synth.stream_violation("a\n\nb\n\nc") == "paragraphs>2"
+    assert grade_synth.stream_violation("w " * 221) == "word_count>220"
+    assert grade_lean.stream_violation("theorem foo : True := by\n  trivial") is None
+    assert grade_lean.stream_violation("Here:\n```lean") == "code_fence"
+
+
+def test_stream_checks_carry_state_across_deltas():
+    synth = grade_synth.StreamCheck()
+    assert [synth(d) for d in ("Lem", "ma: a\n", "\nb\n", "\nc")] == [
+        None,
+        None,
+        None,
+        "paragraphs>2",
+    ]
+    assert synth.words == 3
+    words = grade_synth.StreamCheck()
+    verdicts = [words(d) for d in ["w", "ord "] * 221]
+    assert verdicts.index("word_count>220") == 440
+    lean = grade_lean.StreamCheck()
+    assert [lean(d) for d in ("Here:`", "`", "`lean")] == [None, None, "code_fence"]
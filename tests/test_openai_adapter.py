@@ -0,0 +1,332 @@
+import io
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+from harness.cache import CapabilityCache
+from harness.concurrency import LimitedClient, ModelLimiter
+from harness.models import ModelClient
+from harness.openai_adapter import (
+    APIError,
+    ConnectionPool,
+    OpenAIAdapter,
+    _parse_duration,
+    _retry_after,
+    _sse_events,
+    normalize_usage,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", "0"))
+        payload = json.loads(self.rfile.read(length))
+        self.server.calls.append((self.path, payload))
+        headers = {}
+        if self.server.throttle:
+            self.server.throttle -= 1
+            status, body = 429, {"error": {"message": "slow down"}}
+            headers["Retry-After"] = "2"
+        elif self.path.endswith("/responses"):
+            status, body = 404, {"error": {"message": "not found"}}
+        elif payload.get("messages", [{}])[0].get("content") == "overflow":
+            status, body = 400, {"error": {"message": "maximum context length"}}
+        elif self.path.endswith("/chat/completions") and payload.get("stream"):
+            content = payload["messages"][0]["content"]
+            if content.startswith("stream-error:"):
+                error = {"message": "stopped", "code": content.split(":")[1]}
+                self._stream_events([{"error": error}])
+                return
+            self._stream_chat(["echo:", content])
+            return
+        elif self.path.endswith("/chat/completions"):
+            text = f"echo:{payload['messages'][0]['content']}"
+            status, body = (
+                200,
+                {
+                    "choices": [{"message": {"content": text}}],
+                    "usage": {"prompt_tokens": 5, "completion_tokens": 2},
+                },
+            )
+        else:
+            status, body = 500, {"error": {"message": "boom"}}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream_chat(self, deltas):
+        self._stream_events([{"choices": [{"delta": {"content": d}}]} for d in deltas])
+
+    def _stream_events(self, events):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for data in [*map(json.dumps, events), "[DONE]"]:
+            chunk = f"data: {data}\n\n".encode()
+            self.wfile.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+@pytest.fixture
+def api_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    server.calls = []
+    server.throttle = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _base(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def test_adapter_falls_back_from_responses_to_chat(api_server):
+    adapter = OpenAIAdapter(api_key="k", api_base=_base(api_server))
+    assert adapter.generate("hi", "m") == "echo:hi"
+    assert [path for path, _ in api_server.calls] == [
+        "/v1/responses",
+        "/v1/chat/completions",
+    ]
+
+
+def test_adapter_reports_failing_endpoint(api_server):
+    adapter = OpenAIAdapter(
+        api_key="k",
+        api_base=_base(api_server),
+        force_endpoint="completions",
+        max_retries=0,
+    )
+    with pytest.raises(APIError) as excinfo:
+        adapter.generate("hi", "m")
+    assert excinfo.value.endpoint == "completions"
+    assert excinfo.value.message == "boom"
+
+
+def test_model_client_uses_native_adapter(api_server):
+    adapter = OpenAIAdapter(api_key="k", api_base=_base(api_server))
+    client = ModelClient(cmd_template=None, adapter=adapter)
+    assert client.generate("ping", "m", "md", "t01") == "echo:ping"
+
+
+def test_adapter_reuses_pooled_connection(api_server):
+    ports = []
+    original = _Handler.do_POST
+
+    def tracking(handler):
+        ports.append(handler.client_address[1])
+        original(handler)
+
+    _Handler.do_POST = tracking
+    try:
+        adapter = OpenAIAdapter(
+            api_key="k", api_base=_base(api_server), pool=ConnectionPool(2)
+        )
+        adapter.generate("a", "m")
+        adapter.generate("b", "m")
+    finally:
+        _Handler.do_POST = original
+    # responses -> chat fallbacks and both calls share one keep-alive socket.
+    assert len(ports) == 4
+    assert len(set(ports)) == 1
+
+
+def test_adapter_retries_throttled_calls_after_server_hint(api_server):
+    api_server.throttle = 2
+    delays = []
+    adapter = OpenAIAdapter(
+        api_key="k",
+        api_base=_base(api_server),
+        force_endpoint="chat",
+        backoff_base=0.01,
+        sleep=delays.append,
+    )
+    assert adapter.generate("hi", "m") == "echo:hi"
+    assert len(api_server.calls) == 3
+    assert len(delays) == 2
+    assert all(d >= 2.0 for d in delays)
+
+
+def test_rate_limit_is_charged_per_http_request(api_server):
+    class _CountingLimiter(ModelLimiter):
+        def __init__(self):
+            super().__init__(rpm=6000)
+            self.charged = []
+
+        def acquire(self, model):
+            self.charged.append(model)
+            super().acquire(model)
+
+    api_server.throttle = 2
+    adapter = OpenAIAdapter(
+        api_key="k",
+        api_base=_base(api_server),
+        force_endpoint="chat",
+        sleep=lambda _: None,
+    )
+    limiter = _CountingLimiter()
+    client = LimitedClient(ModelClient(cmd_template=None, adapter=adapter), limiter)
+    assert client.generate("hi", "m", "md", "t01") == "echo:hi"
+    # Two throttled tries and the one that succeeded, none charged twice.
+    assert limiter.charged == ["m", "m", "m"]
+
+
+def test_retry_after_reads_standard_and_rate_limit_headers():
+    assert _parse_duration("6m0s") == 360.0
+    assert _parse_duration("20ms") == 0.02
+    assert _parse_duration("soon") is None
+    assert _retry_after({"retry-after": "3"}) == 3.0
+    assert _retry_after({"retry-after-ms": "1500"}) == 1.5
+    limited = {
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-reset-requests": "1.5s",
+        "x-ratelimit-remaining-tokens": "900",
+        "x-ratelimit-reset-tokens": "30s",
+    }
+    assert _retry_after(limited) == 1.5
+    assert _retry_after({}) is None
+
+
+def test_adapter_streams_chat_deltas_and_keeps_connection(api_server):
+    tokens = []
+    adapter = OpenAIAdapter(
+        api_key="k", api_base=_base(api_server), pool=ConnectionPool(2)
+    )
+    assert adapter.generate("hi", "m", on_token=tokens.append) == "echo:hi"
+    assert tokens == ["echo:", "hi"]
+    assert api_server.calls[-1][1]["stream"] is True
+    assert adapter.generate("again", "m") == "echo:again"
+    assert sum(len(idle) for idle in adapter.pool._idle.values()) == 1
+
+
+def test_sse_events_reads_responses_stream():
+    stream = io.BytesIO(
+        b"event: response.output_text.delta\n"
+        b'data: {"type": "response.output_text.delta", "delta": "a"}\n\n'
+        b": keep-alive\n\n"
+        b'data: {"type": "response.completed", "response": {"output_text": "a"}}\n'
+    )
+    events = list(_sse_events(stream))
+    assert [e["type"] for e in events] == [
+        "response.output_text.delta",
+        "response.completed",
+    ]
+
+
+def test_model_client_streams_command_stdout():
+    script = (
+        "import os, sys, time; sys.stdin.read(); "
+        "sys.stdout.write(os.environ['OPENAI_STREAM']); sys.stdout.flush(); "
+        "time.sleep(0.05); sys.stdout.write('b')"
+    )
+    client = ModelClient(cmd_template=f'{sys.executable} -c "{script}"')
+    tokens = []
+    assert client.generate("p", "m", "md", "t01", on_token=tokens.append) == "1b"
+    assert tokens == ["1", "b"]
+
+
+def test_adapter_reports_normalized_usage(api_server):
+    meta = {}
+    adapter = OpenAIAdapter(api_key="k", api_base=_base(api_server))
+    adapter.generate("hi", "m", on_meta=meta.update)
+    assert meta["usage"]["total_tokens"] == 7
+    responses_usage = {
+        "input_tokens": 10,
+        "output_tokens": 30,
+        "output_tokens_details": {"reasoning_tokens": 20},
+        "input_tokens_details": {"cached_tokens": 4},
+        "total_tokens": 40,
+    }
+    assert normalize_usage(responses_usage) == {
+        "prompt_tokens": 10,
+        "completion_tokens": 30,
+        "reasoning_tokens": 20,
+        "cached_tokens": 4,
+        "total_tokens": 40,
+    }
+    assert normalize_usage(None) is None
+
+
+def test_cli_reports_trace_through_meta_fd(api_server, monkeypatch, tmp_path):
+    for name in ("OPENROUTER_API_KEY", "OPENROUTER_API_BASE", "OPENAI_FORCE_ENDPOINT"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("OPENAI_API_KEY", "k")
+    monkeypatch.setenv("OPENAI_CAPABILITY_CACHE", str(tmp_path))
+    cli = Path(__file__).resolve().parents[1] / "scripts" / "openai_cli.py"
+    client = ModelClient(
+        cmd_template=f"{sys.executable} {cli} --model m --api-base {_base(api_server)}"
+    )
+    meta = {}
+    assert client.generate("hi", "m", "md", "t01", on_meta=meta.update) == "echo:hi"
+    assert meta["endpoint"] == "chat"
+    assert [(r["endpoint"], r["status"]) for r in meta["requests"]] == [
+        ("responses", 404),
+        ("chat", 200),
+    ]
+    assert meta["usage"]["total_tokens"] == 7
+    assert meta["total_sec"] >= sum(r["sec"] for r in meta["requests"])
+
+
+def test_adapter_skips_known_failing_endpoint(api_server, tmp_path):
+    caps = CapabilityCache(tmp_path)
+    adapter = OpenAIAdapter(api_key="k", api_base=_base(api_server), capabilities=caps)
+    adapter.generate("a", "m")
+    meta = {}
+    assert adapter.generate("b", "m", on_meta=meta.update) == "echo:b"
+    assert [path for path, _ in api_server.calls] == [
+        "/v1/responses",
+        "/v1/chat/completions",
+        "/v1/chat/completions",
+    ]
+    assert meta["capabilities_cached"] is True
+    assert caps.get(caps.key(_base(api_server), "m")) == {"endpoint": "chat"}
+
+
+def test_plain_bad_request_keeps_learned_capabilities(api_server, tmp_path):
+    caps = CapabilityCache(tmp_path)
+    adapter = OpenAIAdapter(api_key="k", api_base=_base(api_server), capabilities=caps)
+    adapter.generate("a", "m")
+    api_server.calls.clear()
+    with pytest.raises(APIError):
+        adapter.generate("overflow", "m")
+    assert [path for path, _ in api_server.calls] == ["/v1/chat/completions"]
+    assert caps.get(caps.key(_base(api_server), "m")) == {"endpoint": "chat"}
+
+
+@pytest.mark.parametrize(
+    ("code", "status", "requests"),
+    [("content_filter", 400, 1), ("rate_limit_exceeded", 429, 2)],
+)
+def test_stream_error_events_retry_only_transient_errors(
+    api_server, code, status, requests
+):
+    adapter = OpenAIAdapter(
+        api_key="k",
+        api_base=_base(api_server),
+        force_endpoint="chat",
+        max_retries=1,
+        sleep=lambda _: None,
+    )
+    with pytest.raises(APIError) as excinfo:
+        adapter.generate(f"stream-error:{code}", "m", on_token=lambda _: None)
+    assert excinfo.value.status == status
+    assert excinfo.value.message == "stopped"
+    assert len(api_server.calls) == requests
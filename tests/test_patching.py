@@ -0,0 +1,143 @@
+import shutil
+import subprocess
+
+import pytest
+
+from harness.graders.patching import apply_patch
+
+ORIGINAL = "".join(f"line {i}\n" for i in range(1, 21))
+
+
+def _diff(*lines):
+    return "\n".join(lines) + "\n"
+
+
+def test_apply_patch_detects_strip_level(tmp_path):
+    (tmp_path / "impl.py").write_text(ORIGINAL)
+    for old, new in (("a/impl.py", "b/impl.py"), ("impl.py", "impl.py")):
+        (tmp_path / "impl.py").write_text(ORIGINAL)
+        patch = _diff(
+            f"--- {old}",
+            f"+++ {new}",
+            "@@ -2,3 +2,3 @@",
+            " line 2",
+            "-line 3",
+            "+line three",
+            " line 4",
+        )
+        assert apply_patch(tmp_path, patch) == (True, "")
+        assert "line three\nline 4\n" in (tmp_path / "impl.py").read_text()
+
+
+def test_apply_patch_handles_offsets_fuzz_and_new_files(tmp_path):
+    # Two extra lines at the top shift every hunk; the second hunk's outer
+    # context is stale and only applies with fuzz.
+    (tmp_path / "impl.py").write_text("# header\n\n" + ORIGINAL)
+    patch = _diff(
+        "--- a/impl.py",
+        "+++ b/impl.py",
+        "@@ -2,3 +2,4 @@",
+        " line 2",
+        " line 3",
+        "+inserted",
+        " line 4",
+        "@@ -15,3 +16,3 @@",
+        " stale context",
+        "-line 16",
+        "+line sixteen",
+        " line 17",
+        "--- /dev/null",
+        "+++ b/tests.py",
+        "@@ -0,0 +1,2 @@",
+        "+def test_ok():",
+        "+    assert True",
+    )
+    assert apply_patch(tmp_path, patch) == (True, "")
+    text = (tmp_path / "impl.py").read_text()
+    assert "line 3\ninserted\nline 4\n" in text
+    assert "line 15\nline sixteen\nline 17\n" in text
+    assert (tmp_path / "tests.py").read_text() == "def test_ok():\n    assert True\n"
+
+
+def test_apply_patch_reports_failed_hunks_without_writing(tmp_path):
+    (tmp_path / "impl.py").write_text(ORIGINAL)
+    patch = _diff(
+        "--- a/impl.py",
+        "+++ b/impl.py",
+        "@@ -2,1 +2,1 @@",
+        "-line 2",
+        "+line two",
+        "@@ -10,1 +10,1 @@",
+        "-no such line",
+        "+replacement",
+    )
+    applied, error = apply_patch(tmp_path, patch)
+    assert not applied
+    assert error == "hunk #2 FAILED at 10 in impl.py"
+    assert (tmp_path / "impl.py").read_text() == ORIGINAL
+
+
+def test_apply_patch_splits_lines_on_newline_only(tmp_path):
+    original = "a\fb\nc\u2028d\x1ce\nlast\n"
+    (tmp_path / "impl.py").write_bytes(original.encode())
+    patch = _diff(
+        "--- a/impl.py",
+        "+++ b/impl.py",
+        "@@ -1,3 +1,3 @@",
+        " a\fb",
+        "-c\u2028d\x1ce",
+        "+changed",
+        " last",
+    )
+    assert apply_patch(tmp_path, patch) == (True, "")
+    text = (tmp_path / "impl.py").read_bytes().decode()
+    assert text == "a\fb\nchanged\nlast\n"
+
+
+def test_apply_patch_anchors_start_of_file_hunks(tmp_path):
+    # Context only after the change means diff saw the start of the file, so
+    # like GNU patch the hunk must not drift down past the new header even
+    # though fuzz 2 would leave "line 1" and "line 2" to match there.
+    original = "# header\n\n" + ORIGINAL
+    (tmp_path / "impl.py").write_text(original)
+    patch = _diff(
+        "--- a/impl.py",
+        "+++ b/impl.py",
+        "@@ -1,4 +1,4 @@",
+        "-line 1",
+        "+first",
+        " line 2",
+        " line 3",
+        " line 4",
+    )
+    assert apply_patch(tmp_path, patch) == (
+        False,
+        "hunk #1 FAILED at 1 in impl.py",
+    )
+    assert (tmp_path / "impl.py").read_text() == original
+
+
+@pytest.mark.skipif(shutil.which("patch") is None, reason="GNU patch not installed")
+def test_apply_patch_matches_gnu_patch(tmp_path):
+    patch = _diff(
+        "--- impl.py",
+        "+++ impl.py",
+        "@@ -1,2 +1,2 @@",
+        "-line 1",
+        "+first",
+        " line 2",
+        "@@ -19,2 +19,2 @@",
+        " line 19",
+        "-line 20",
+        "+last",
+        "\\ No newline at end of file",
+    )
+    ours, theirs = tmp_path / "ours", tmp_path / "theirs"
+    for root in (ours, theirs):
+        root.mkdir()
+        (root / "impl.py").write_text(ORIGINAL)
+    assert apply_patch(ours, patch) == (True, "")
+    subprocess.run(
+        ["patch", "-p0", "-s"], input=patch, text=True, cwd=theirs, check=True
+    )
+    assert (ours / "impl.py").read_text() == (theirs / "impl.py").read_text()
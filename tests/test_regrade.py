@@ -0,0 +1,80 @@
+import json
+import time
+
+from harness import core
+from harness.outputs import OutputStore
+from harness.regrade import main, regrade_task
+
+GOOD = (
+    "Verdict: true.\n"
+    "Proof sketch: the base case n=1 holds and the step follows by a standard bound."
+)
+
+
+def _md_task(tmp_path):
+    path = tmp_path / "t01.md"
+    path.write_text(
+        "# Task\n\n<!-- rubric:\nmust: Verdict:\nmust: Proof sketch:\n-->\n",
+        encoding="utf-8",
+    )
+    return core.Task(task_id="t01", task_type="md", path=path)
+
+
+def test_output_store_round_trip_tolerates_truncation(tmp_path):
+    task = _md_task(tmp_path)
+    store = OutputStore(tmp_path / "outputs.jsonl.gz")
+    store.record(task, "m", {"attempt": 1, "elapsed_sec": 1.0}, "first")
+    store.record(task, "m", {"attempt": 2, "elapsed_sec": 1.0}, "second")
+    with store.path.open("ab") as f:
+        f.write(b"\x1f\x8b\x08")  # a member cut short by a crash
+    assert [e["output"] for e in store] == ["first", "second"]
+
+
+def test_output_store_reads_past_a_torn_member(tmp_path):
+    task = _md_task(tmp_path)
+    store = OutputStore(tmp_path / "outputs.jsonl.gz")
+    store.record(task, "m", {"attempt": 1, "elapsed_sec": 1.0}, "first")
+    store.record(task, "m", {"attempt": 2, "elapsed_sec": 1.0}, "second")
+    data = store.path.read_bytes()
+    store.path.write_bytes(data[: len(data) - 10])  # crash mid-write
+    store.record(task, "m", {"attempt": 2, "elapsed_sec": 1.0}, "resumed")
+    assert [e["output"] for e in store] == ["first", "resumed"]
+
+
+def test_output_store_reads_many_records_in_linear_time(tmp_path):
+    task = _md_task(tmp_path)
+    store = OutputStore(tmp_path / "outputs.jsonl.gz")
+    for n in range(5000):
+        store.record(task, "m", {"attempt": n, "elapsed_sec": 1.0}, "x" * 200)
+    start = time.time()
+    assert sum(1 for _ in store) == 5000
+    # Re-slicing the file per member took tens of seconds at this size.
+    assert time.time() - start < 5.0
+
+
+def test_regrade_task_scores_stored_outputs(tmp_path):
+    task = _md_task(tmp_path)
+    entries = {
+        1: {"output": "nope", "elapsed_sec": 2.0},
+        2: {"output": GOOD, "elapsed_sec": 3.0},
+    }
+    result = regrade_task(task, "m", entries, 2, tmp_path)
+    assert result["pass_at_1"] is False
+    assert result["pass_at_k"] is True
+    assert result["time_to_fix"] == 3.0
+
+
+def test_regrade_keeps_the_runs_attempt_budget(tmp_path, monkeypatch):
+    monkeypatch.delenv("LOCAL_EVAL_ARBITER_CMD", raising=False)
+    task = core.Task(task_id="t01_bigO_edges", task_type="md", path=tmp_path)
+    store = OutputStore(tmp_path / "outputs.jsonl.gz")
+    store.record(task, "m", {"attempt": 1, "elapsed_sec": 1.0}, "nope")
+    (tmp_path / "metrics.json").write_text(
+        json.dumps({"run": {"max_tries": 5}}), encoding="utf-8"
+    )
+    main(["--reports-dir", str(tmp_path), "--jobs", "1"])
+    metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["results"][0]["attempts_total"] == 5
+    main(["--reports-dir", str(tmp_path), "--jobs", "1", "--max-tries", "3"])
+    metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["results"][0]["attempts_total"] == 3
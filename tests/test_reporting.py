@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from harness.reporting import MetricsAggregator, ResultLog, RunAggregate, usage_cost
+from harness.run_eval import _write_metrics, _write_summary
+
+
+def _result(task_id, task_type, passed, pass_rate, ttf, coverage=None):
+    details = {} if coverage is None else {"coverage_percent": coverage}
+    return {
+        "task_id": task_id,
+        "task_type": task_type,
+        "model": "m",
+        "pass_at_1": passed,
+        "pass_at_k": passed or pass_rate > 0,
+        "pass_rate": pass_rate,
+        "time_to_fix": ttf,
+        "attempts": [{"attempt": 1, "details": details}],
+    }
+
+
+RESULTS = [
+    _result("a", "md", True, 1.0, 2.0),
+    _result("b", "md", False, 0.5, 4.0),
+    _result("c", "py", False, 0.0, None, coverage=80.0),
+    _result("d", "py", True, 1.0, 0.0, coverage=100.0),
+]
+
+
+def test_run_aggregate_matches_full_recompute():
+    agg = RunAggregate()
+    for r in RESULTS:
+        agg.add(r)
+    assert agg.pass_rate() == 0.5
+    assert agg.pass_rate("md", key="pass_rate") == 0.75
+    assert agg.pass_rate("py", key="pass_at_k") == 0.5
+    assert agg.pass_rate("lean") is None
+    assert agg.time_to_fix_avg() == 3.0
+    assert agg.py_coverage_avg() == 90.0
+    assert RunAggregate(RESULTS).pass_rate("py") == agg.pass_rate("py")
+
+
+def test_result_log_skips_torn_last_line(tmp_path):
+    log = ResultLog(tmp_path / "results.jsonl")
+    for r in RESULTS[:2]:
+        log.append(r)
+    with log.path.open("a", encoding="utf-8") as f:
+        f.write('{"task_id": "c", "task_')
+    assert [r["task_id"] for r in log] == ["a", "b"]
+
+
+def test_metrics_aggregator_groups_and_fans_out_list_fields():
+    tagged = [
+        dict(r, tags=["easy", "core"] if r["pass_at_1"] else ["hard"]) for r in RESULTS
+    ]
+    agg = MetricsAggregator([("task_type",), ("tags",)], tagged)
+    assert [row["task_type"] for row in agg.rows(("task_type",))] == ["md", "py"]
+    by_tag = {row["tags"]: row for row in agg.rows(("tags",))}
+    assert by_tag["easy"]["tasks"] == by_tag["core"]["tasks"] == 2
+    assert by_tag["hard"]["pass_at_1"] == 0.0
+    assert agg.stats(("task_type",), ("py",)).as_dict()["py_coverage_avg"] == 90.0
+
+
+def test_run_aggregate_counts_tokens_and_cost_per_solved_task():
+    usage = {"prompt_tokens": 1000, "completion_tokens": 500, "total_tokens": 1500}
+    attempts = [{"details": {}, "usage": usage}] * 2
+    results = [dict(r, attempts=attempts) for r in RESULTS]
+    prices = {"m": {"input": 2.0, "output": 10.0}}
+    agg = RunAggregate(results, prices=prices)
+    overall = agg.usage()
+    assert overall["total_tokens"] == 8 * 1500
+    assert overall["attempts_with_usage"] == 8
+    # Three tasks pass at k (b has pass_rate 0.5).
+    assert overall["tokens_per_pass"] == 8 * 1500 / 3
+    assert usage_cost(usage, prices["m"]) == pytest.approx(0.007)
+    assert overall["cost_usd"] == pytest.approx(8 * 0.007)
+    assert agg.usage(model="m") == overall
+    assert RunAggregate(results).usage()["cost_usd"] is None
+
+
+def test_passk_reports_leave_out_biased_pass_rates(tmp_path):
+    meta = {
+        "timestamp": "t",
+        "logic_model": "m",
+        "code_model": "m",
+        "max_tries": 3,
+        "adaptive": "passk",
+    }
+    _write_metrics(tmp_path, meta, RESULTS)
+    _write_summary(tmp_path, meta, RESULTS)
+    metrics = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert metrics["pass_rate"] is None
+    assert metrics["pass_at_k_unbiased"] is None
+    assert metrics["pass_at_k"]["overall"] == 0.75
+    summary = (tmp_path / "summary.md").read_text(encoding="utf-8")
+    assert "pass@3 overall: 0.75" in summary
+    assert "avg pass rate" not in summary
+    assert "unbiased" not in summary
@@ -0,0 +1,214 @@
+import subprocess
+import threading
+import time
+
+from harness.graders import grade_py, sandbox
+from harness.graders.py_pool import PyGrader, PyGraderPool
+from harness.graders.sandbox import SandboxPool
+
+PATCH = "\n".join(
+    [
+        "--- a/tests.py",
+        "+++ b/tests.py",
+        "@@ -1,5 +1,9 @@",
+        " from impl import double",
+        " ",
+        " ",
+        " def test_double():",
+        "     assert double(2) == 4",
+        "+",
+        "+",
+        "+def test_double_zero():",
+        "+    assert double(0) == 0",
+        "",
+    ]
+)
+
+
+def _task(tmp_path):
+    root = tmp_path / "repo"
+    task = root / "task"
+    task.mkdir(parents=True)
+    (root / "pyproject.toml").write_text(
+        '[tool.pytest.ini_options]\npython_files = ["tests.py"]\n', encoding="utf-8"
+    )
+    (task / "impl.py").write_text("def double(x):\n    return 2 * x\n")
+    (task / "tests.py").write_text(
+        "from impl import double\n\n\ndef test_double():\n    assert double(2) == 4\n"
+    )
+    return root, task
+
+
+def test_sandbox_checkout_resets_between_attempts(tmp_path):
+    root, task = _task(tmp_path)
+    pool = SandboxPool(root)
+    try:
+        with pool.checkout(task) as first:
+            (first / "tests.py").write_text("broken")
+            (first / "__pycache__").mkdir()
+            (first / "__pycache__" / "x.pyc").write_bytes(b"x")
+            (first / ".coverage").write_text("data")
+        with pool.checkout(task) as second:
+            assert second == first
+            assert (second / "tests.py").read_text().startswith("from impl")
+            assert not (second / "__pycache__").exists()
+            assert not (second / ".coverage").exists()
+            assert (second / "pyproject.toml").exists()
+    finally:
+        pool.close()
+
+
+def test_warm_grading_matches_cold(tmp_path):
+    root, task = _task(tmp_path)
+    cold = grade_py.evaluate(task, PATCH, repo_root=root, min_coverage=50)
+    pool = SandboxPool(root)
+    try:
+        for _ in range(2):
+            warm = grade_py.evaluate(
+                task, PATCH, repo_root=root, min_coverage=50, sandbox_pool=pool
+            )
+            for key in ("patch_applied", "tests_ok", "coverage_percent", "ruff_ok"):
+                assert warm[key] == cold[key]
+    finally:
+        pool.close()
+    assert cold["tests_ok"] is True
+
+
+HANG_PATCH = PATCH.replace("+1,9", "+1,10").replace(
+    "    assert double(0) == 0", "    while True:\n+        pass"
+)
+
+
+def test_runaway_tests_are_killed_after_timeout(tmp_path):
+    root, task = _task(tmp_path)
+    grader = PyGrader(root, warm=True, timeout=2)
+    try:
+        result = grader.evaluate(task, HANG_PATCH, repo_root=root, min_coverage=50)
+    finally:
+        grader.close()
+    assert result["tests_timed_out"] is True
+    assert result["passed"] is False
+
+
+def test_cold_coverage_report_timeout_fails_the_attempt(tmp_path, monkeypatch):
+    root, task = _task(tmp_path)
+    real_run = grade_py.subprocess.run
+
+    def run(cmd, **kwargs):
+        if cmd[-2:] == ["report", "-m"]:
+            raise subprocess.TimeoutExpired(cmd, kwargs.get("timeout"))
+        return real_run(cmd, **kwargs)
+
+    monkeypatch.setattr(grade_py.subprocess, "run", run)
+    grader = PyGrader(root, warm=False, timeout=60)
+    try:
+        result = grader.evaluate(task, PATCH, repo_root=root, min_coverage=50)
+    finally:
+        grader.close()
+    assert result["tests_timed_out"] is True
+    assert result["passed"] is False
+    assert "coverage report timed out" in result["pytest_error"]
+
+
+def test_process_pool_grades_in_workers(tmp_path):
+    root, task = _task(tmp_path)
+    pool = PyGraderPool(root, workers=2, timeout=60)
+    try:
+        results = [
+            pool.evaluate(task, PATCH, repo_root=root, min_coverage=50)
+            for _ in range(2)
+        ]
+    finally:
+        pool.close()
+    assert all(r["tests_ok"] for r in results)
+
+
+def test_cold_grading_shares_one_deadline_per_attempt(tmp_path, monkeypatch):
+    root, task = _task(tmp_path)
+    real_run = grade_py.subprocess.run
+    timeouts = []
+
+    def run(cmd, **kwargs):
+        timeouts.append(kwargs["timeout"])
+        return real_run(cmd, **kwargs)
+
+    monkeypatch.setattr(grade_py.subprocess, "run", run)
+    grader = PyGrader(root, warm=False, timeout=60)
+    try:
+        result = grader.evaluate(task, PATCH, repo_root=root, min_coverage=50)
+    finally:
+        grader.close()
+    assert result["passed"] is True
+    # pytest, coverage report and ruff each get what is left of the 60s.
+    assert len(timeouts) == 3
+    assert 60 >= timeouts[0] > timeouts[1] > timeouts[2]
+
+
+def test_process_pool_recovers_from_a_dead_worker(tmp_path):
+    root, task = _task(tmp_path)
+    pool = PyGraderPool(root, workers=1, timeout=60)
+    results = []
+    try:
+        grading = threading.Thread(
+            target=lambda: results.append(
+                pool.evaluate(task, PATCH, repo_root=root, min_coverage=50)
+            )
+        )
+        grading.start()
+        deadline = time.monotonic() + 10
+        while not pool._executor._processes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        for proc in list(pool._executor._processes.values()):
+            proc.kill()
+        grading.join(30)
+        results.append(pool.evaluate(task, PATCH, repo_root=root, min_coverage=50))
+    finally:
+        pool.close()
+    assert results[0]["passed"] is False
+    assert "worker died" in results[0]["grader_error"]
+    assert results[1]["tests_ok"] is True
+
+
+def test_failed_worker_frees_its_slot(tmp_path, monkeypatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    class _FlakyWorker:
+        created = 0
+
+        def __init__(self):
+            _FlakyWorker.created += 1
+            self.first = _FlakyWorker.created == 1
+
+        def run(self, cwd, timeout=None):
+            if self.first:
+                started.set()
+                release.wait(5)
+                raise RuntimeError("py worker exited unexpectedly")
+            return {"ok": True}
+
+        def close(self):
+            pass
+
+    monkeypatch.setattr(sandbox, "_Worker", _FlakyWorker)
+    pool = SandboxPool(tmp_path, workers=1)
+    errors = []
+
+    def crash():
+        try:
+            pool.run_tests(tmp_path)
+        except RuntimeError as exc:
+            errors.append(exc)
+
+    first = threading.Thread(target=crash)
+    first.start()
+    started.wait(5)
+    replies = []
+    waiter = threading.Thread(target=lambda: replies.append(pool.run_tests(tmp_path)))
+    waiter.start()
+    release.set()
+    first.join(5)
+    waiter.join(5)
+    pool.close()
+    assert errors and replies == [{"ok": True}]
+    assert _FlakyWorker.created == 2
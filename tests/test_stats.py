@@ -0,0 +1,42 @@
+from math import comb
+
+import pytest
+
+from harness.stats import (
+    pass_at_k_curve,
+    pass_at_k_estimates,
+    should_stop_sampling,
+    wilson_interval,
+)
+
+
+@pytest.mark.parametrize("n,c", [(1, 0), (1, 1), (5, 2), (20, 3), (20, 20)])
+def test_pass_at_k_curve_matches_combinatorial_formula(n, c):
+    expected = [1 - comb(n - c, k) / comb(n, k) for k in range(1, n + 1)]
+    assert pass_at_k_curve(n, c) == pytest.approx(expected)
+
+
+def test_pass_at_k_estimates_average_tasks_and_bound_with_ci():
+    samples = {(20, 0): 3, (20, 5): 4, (20, 20): 3, (5, 1): 2}
+    estimates = pass_at_k_estimates(samples, resamples=200)
+    assert set(estimates) == {str(k) for k in range(1, 21)}
+    # Tasks with fewer than k samples drop out of pass@k.
+    assert estimates["5"]["tasks"] == 12
+    assert estimates["6"]["tasks"] == 10
+    expected_1 = (4 * 5 / 20 + 3 * 1.0 + 2 * 1 / 5) / 12
+    assert estimates["1"]["estimate"] == pytest.approx(expected_1)
+    for entry in estimates.values():
+        lo, hi = entry["ci"]
+        assert lo <= entry["estimate"] <= hi
+    assert pass_at_k_estimates(samples, resamples=200) == estimates
+
+
+def test_should_stop_sampling_modes():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    lo, hi = wilson_interval(5, 10)
+    assert lo < 0.5 < hi
+    assert not should_stop_sampling([True], "ci")  # below min_samples
+    assert should_stop_sampling([True] * 4, "ci")
+    assert not should_stop_sampling([True, False, True, False], "ci")
+    assert should_stop_sampling([False, True], "passk")
+    assert not should_stop_sampling([True] * 10, "off")